@@ -0,0 +1,45 @@
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+
+
+SIZE = 100000
+
+SCRIPTS = {
+    "scalar loop": f"""
+var total = 0;
+for (var i = 0; i < {SIZE}; i = i + 1) {{ total = total + i * 2; }}
+print total;
+""",
+    "array builtins": f"""
+var xs = arrayRange({SIZE});
+print arraySum(arrayMul(xs, 2));
+""",
+    "array element loop": f"""
+var xs = arrayRange({SIZE});
+var total = 0;
+for (var i = 0; i < {SIZE}; i = i + 1) {{ total = total + arrayGet(xs, i) * 2; }}
+print total;
+""",
+}
+
+
+def run(source: str, backend: str) -> tuple[float, str]:
+    out = io.StringIO()
+    session = LoxSession(backend, out)
+    start = time.perf_counter()
+    session.run(source)
+    return time.perf_counter() - start, out.getvalue().strip()
+
+
+if __name__ == "__main__":
+    for backend in ("interpreter", "vm"):
+        print(backend)
+        for name, source in SCRIPTS.items():
+            elapsed, output = run(source, backend)
+            print(f"  {name:<20}{elapsed * 1e3:9.1f} ms  {output}")
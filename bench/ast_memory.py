@@ -0,0 +1,63 @@
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from packed_ast import pack
+from parser import Parser
+from scanner import Scanner
+
+
+def generate_source(lines: int) -> str:
+    chunk = [
+        "fun f{n}(a, b) {{",
+        "    var c = a * b + (a - b) / 2;",
+        "    if (c > 10 and !(a == b)) {{",
+        "        c = c - 1;",
+        "    }} else {{",
+        "        print \"small\";",
+        "    }}",
+        "    for (var i = 0; i < 3; i = i + 1) c = c + i;",
+        "    return c;",
+        "}}",
+    ]
+    out = []
+    n = 0
+    while len(out) < lines:
+        out.extend(line.format(n=n) for line in chunk)
+        n += 1
+    return "\n".join(out[:lines]) + "\n"
+
+
+def parse_memory(source: str):
+    tokens = Scanner(source).scan_tokens()
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    statements = Parser(tokens).parse()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return statements, tokens, size
+
+
+def packed_memory(statements, tokens) -> int:
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    packed = pack(statements, tokens)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    assert len(packed) == len(statements)
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    source = generate_source(lines)
+    statements, tokens, size = parse_memory(source)
+    print(f"{lines} lines, {len(tokens)} tokens")
+    print(f"  AST nodes        {size / 2**20:8.1f} MiB")
+    print(f"  packed AST       {packed_memory(statements, tokens) / 2**20:8.1f} MiB")
@@ -0,0 +1,128 @@
+import argparse
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+# --tree times another checkout with these same scripts, so it has to be on
+# sys.path before lox is imported. The baseline is such a checkout from before
+# fuel existed: a tree without budgets, not just one with no limits set.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TREE = sys.argv[sys.argv.index("--tree") + 1] if "--tree" in sys.argv else ROOT
+sys.path.insert(0, TREE)
+
+from lox import BACKENDS, LoxSession
+
+
+REPEAT = 5
+ROUNDS = 5
+# Untimed runs first: the python backend's generated code keeps getting faster
+# for about this many runs, whichever budget happens to come first.
+WARMUP = 8
+
+# Loop iterations and calls are what burn fuel, so these do little else.
+SCRIPTS = {
+    "empty loop": """
+var i = 0;
+while (i < 300000) { i = i + 1; }
+print i;
+""",
+    "calls": """
+fun id(n) { return n; }
+var total = 0;
+for (var i = 0; i < 100000; i = i + 1) { total = total + id(i); }
+print total;
+""",
+    "recursion": """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+print fib(20);
+""",
+}
+
+# Budgets far beyond what the scripts use, so every run finishes and only the
+# cost of checking them shows.
+BUDGETS = {
+    "unlimited": (None, None),
+    "fuel + deadline": (10 ** 9, 3600.0),
+}
+
+
+def run(source: str, backend: str, budget: tuple[int, float]) -> float:
+    session = LoxSession(backend, io.StringIO())
+    # Every call to fib is a fresh argument, but keep memoization out of it.
+    session.interpreter.memo_size = 0
+    if budget is not None:
+        session.interpreter.set_budget(*budget)
+    start = time.perf_counter()
+    session.run(source)
+    elapsed = time.perf_counter() - start
+    if session.had_error or session.had_runtime_error:
+        raise RuntimeError("benchmark program failed")
+    return elapsed
+
+
+def time_tree(backends: list[str]) -> dict[str, float]:
+    # Best of REPEAT for each script, backend and budget in this process's tree,
+    # taking turns between the budgets. A tree from before fuel has no budgets.
+    has_budgets = hasattr(LoxSession("interpreter").interpreter, "set_budget")
+    budgets = BUDGETS if has_budgets else {"no budgets": None}
+    times = {}
+    for backend in backends:
+        for name, source in SCRIPTS.items():
+            for _ in range(WARMUP):
+                run(source, backend, None)
+            for _ in range(REPEAT):
+                for label, budget in budgets.items():
+                    key = f"{name}/{backend}/{label}"
+                    times[key] = min(times.get(key, float("inf")), run(source, backend, budget))
+    return times
+
+
+def time_in_child(tree: str, backends: list[str]) -> dict[str, float]:
+    command = [sys.executable, os.path.abspath(__file__), "--tree", tree, "--child"]
+    for backend in backends:
+        command += ["--backend", backend]
+    return json.loads(subprocess.run(command, capture_output=True, text=True, check=True).stdout)
+
+
+def best(runs: list[dict[str, float]]) -> dict[str, float]:
+    return {key: min(run[key] for run in runs) for key in runs[0]}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the fuel and deadline checks against a tree without them.")
+    parser.add_argument("--baseline", metavar="DIR", help="checkout from before fuel, e.g. a git worktree of its parent")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="repeat to run several; default all")
+    parser.add_argument("--tree", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    backends = args.backend or sorted(BACKENDS)
+    if args.child:
+        print(json.dumps(time_tree(backends)))
+        sys.exit(0)
+
+    # Rounds alternate between the trees so that drift in the machine's speed
+    # hits both alike.
+    current, baseline = [], []
+    for _ in range(ROUNDS):
+        current.append(time_in_child(ROOT, backends))
+        if args.baseline:
+            baseline.append(time_in_child(args.baseline, backends))
+    current = best(current)
+    baseline = best(baseline) if baseline else None
+
+    columns = (["no budgets"] if baseline else []) + list(BUDGETS)
+    print(f"{'best ms':<32}" + "".join(f"{label:>18}" for label in columns) + ("  overhead" if baseline else ""))
+    for backend in backends:
+        for name in SCRIPTS:
+            label = f"{name}/{backend}"
+            cells = [current[f"{label}/{budget}"] for budget in BUDGETS]
+            if baseline:
+                cells.insert(0, baseline[f"{label}/no budgets"])
+            row = f"{label:<32}" + "".join(f"{cell * 1e3:18.1f}" for cell in cells)
+            if baseline:
+                row += f"{100 * (cells[1] / cells[0] - 1):+9.1f}%"
+            print(row)
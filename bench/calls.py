@@ -0,0 +1,52 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+
+
+SCRIPTS = {
+    "fib(20)": """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+print fib(20);
+""",
+    "small calls": """
+fun inc(x) { return x + 1; }
+fun sq(x) { return x * x; }
+var total = 0;
+for (var i = 0; i < 30000; i = i + 1) { total = inc(total) + sq(1); }
+print total;
+""",
+    "nested returns": """
+fun find(n) {
+  for (var i = 0; i < 100; i = i + 1) {
+    if (i == n) { while (true) { return i; } }
+  }
+  return -1;
+}
+var total = 0;
+for (var i = 0; i < 2000; i = i + 1) { total = total + find(i - (i / 100) * 100 + 10); }
+print total;
+""",
+}
+
+
+def run(source: str, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        session = LoxSession()
+        session.interpreter.memo_size = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            session.run(source)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    for name, source in SCRIPTS.items():
+        print(f"  {name:<16} {run(source) * 1e3:8.1f} ms")
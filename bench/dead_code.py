@@ -0,0 +1,34 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+from optimizer import count_nodes
+
+
+def generate_source(functions: int) -> str:
+    chunk = [
+        "fun f{n}(a) {{",
+        "    var debug = false;",
+        "    var label = \"f{n}\";",
+        "    if (false) {{ print label; print a * 2; }}",
+        "    while (false) {{ a = a + 1; }}",
+        "    if (true) {{ a = a + {n}; }} else {{ a = a - {n}; }}",
+        "    return a;",
+        "    print \"unreachable\";",
+        "}}",
+    ]
+    return "".join(line.format(n=n) + "\n" for n in range(functions) for line in chunk)
+
+
+if __name__ == "__main__":
+    functions = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    source = generate_source(functions)
+    print(f"{functions} functions, {len(source) / 2**20:.1f} MiB")
+    for opt_level in (0, 1, 2):
+        start = time.perf_counter()
+        statements, resolution = LoxSession().compile(source, opt_level)
+        elapsed = time.perf_counter() - start
+        print(f"  -O{opt_level}  {count_nodes(statements):8} nodes  {len(resolution.locals):8} resolved  {elapsed:6.2f} s")
@@ -0,0 +1,66 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from expr import Variable
+from interpreter import Interpreter
+from lox import LoxSession
+from token_type import TokenType
+from token_ import Token
+
+
+SOURCE = """
+fun add(a, b) {{ return a + b; }}
+fun loop() {{
+  var total = 0;
+  for (var i = 0; i < {n}; i = i + 1) {{ total = add(total, i); }}
+  return total;
+}}
+print loop();
+"""
+
+
+# The lookup as it was before inline caching.
+def uncached_lookup(interpreter: Interpreter, name: Token, expr: Variable):
+    resolved = interpreter.locals.get(expr)
+    if resolved is not None:
+        return interpreter.environment.get_at(*resolved)
+    return interpreter.globals.get(name)
+
+
+def read_cost(rounds: int) -> tuple[float, float]:
+    interpreter = Interpreter()
+    interpreter.globals.define("add", 1.0)
+    name = Token(TokenType.IDENTIFIER, "add", None, 1)
+    expr = Variable(name)
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        uncached_lookup(interpreter, name, expr)
+    uncached = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        interpreter.look_up_variable(name, expr)
+    cached = time.perf_counter() - start
+    return uncached / rounds, cached / rounds
+
+
+def run_loop(iterations: int) -> float:
+    session = LoxSession()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.run(SOURCE.format(n=iterations))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    uncached, cached = read_cost(1000000)
+    print(f"  uncached global read  {uncached * 1e9:8.1f} ns/read")
+    print(f"  inline-cached read    {cached * 1e9:8.1f} ns/read")
+    print(f"  {iterations} global calls  {run_loop(iterations) * 1e3:8.1f} ms")
@@ -0,0 +1,35 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+
+
+SOURCE = """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+fun floor(x) { var i = 0; while (i + 1 <= x) i = i + 1; return i; }
+print fib(18);
+var total = 0;
+for (var i = 0; i < 300; i = i + 1) { total = total + fib(i - 15 * floor(i / 15)); }
+print total;
+"""
+
+
+def run(memo_size: int) -> tuple[float, int, int]:
+    session = LoxSession()
+    interpreter = session.interpreter
+    interpreter.memo_size = memo_size
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.run(SOURCE)
+    return time.perf_counter() - start, interpreter.memo_hits, interpreter.memo_misses
+
+
+if __name__ == "__main__":
+    for memo_size in (0, 8, 1024):
+        elapsed, hits, misses = run(memo_size)
+        print(f"  memo size {memo_size:>5}  {elapsed * 1e3:9.1f} ms  {hits:8} hits  {misses:8} misses")
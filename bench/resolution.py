@@ -0,0 +1,49 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+from parser import Parser
+from resolver import Resolver
+from scanner import Scanner
+
+
+def run_script(path: str, backend: str) -> float:
+    with open(path) as f:
+        source = f.read()
+
+    session = LoxSession(backend)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.run(source)
+    return time.perf_counter() - start
+
+
+def lookup_cost(path: str, rounds: int) -> float:
+    with open(path) as f:
+        source = f.read()
+
+    interpreter = LoxSession().interpreter
+    statements = Parser(Scanner(source).scan_tokens()).parse()
+    Resolver(interpreter).resolve_statements(statements)
+
+    nodes = list(interpreter.locals)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for node in nodes:
+            interpreter.locals.get(node)
+    return (time.perf_counter() - start) / (rounds * len(nodes))
+
+
+if __name__ == "__main__":
+    bench_dir = os.path.dirname(os.path.abspath(__file__))
+    scripts = sys.argv[1:] or [os.path.join(bench_dir, "closures.lox"), os.path.join(bench_dir, "..", "script.lox")]
+
+    for script in scripts:
+        print(f"{os.path.relpath(script)}:")
+        print(f"  locals lookup  {lookup_cost(script, 2000) * 1e9:8.1f} ns/lookup")
+        print(f"  full run       {run_script(script, 'interpreter') * 1e3:8.1f} ms")
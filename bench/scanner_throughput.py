@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ast_memory import generate_source
+from fast_scanner import FastScanner
+from scanner import Scanner
+
+
+def throughput(scanner_class, source: str, buffered: bool, rounds: int = 3) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        scanner = scanner_class(source)
+        start = time.perf_counter()
+        if buffered:
+            scanner.scan_token_buffer()
+        else:
+            scanner.scan_tokens()
+        best = min(best, time.perf_counter() - start)
+    return len(source.encode()) / best / 2**20
+
+
+if __name__ == "__main__":
+    lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    source = generate_source(lines)
+    print(f"{lines} lines, {len(source) / 2**20:.1f} MiB")
+    for name, scanner_class in (("Scanner", Scanner), ("FastScanner", FastScanner)):
+        for mode, buffered in (("list", False), ("buffer", True)):
+            print(f"  {name:<12} {mode:<7} {throughput(scanner_class, source, buffered):8.1f} MB/s")
@@ -0,0 +1,78 @@
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox_server import HOST, PORT
+
+
+# Start the server first, e.g. python lox_server.py -j 4, then run this.
+SOURCE = """
+fun fib(n) { if (n < 2) return n; return fib(n - 1) + fib(n - 2); }
+print fib(15);
+"""
+
+
+async def client(host: str, port: int, path: str, source: str, requests: int, latencies: list, failures: list) -> None:
+    if path is not None:
+        reader, writer = await asyncio.open_unix_connection(path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    # fib is pure, so with memoization each run would make only a handful of
+    # calls instead of timing the interpreter.
+    request = json.dumps({"source": source, "memo_size": 0}).encode() + b"\n"
+    for _ in range(requests):
+        start = time.perf_counter()
+        writer.write(request)
+        await writer.drain()
+        while True:
+            message = json.loads(await reader.readline())
+            if "output" not in message:
+                break
+        latencies.append(time.perf_counter() - start)
+        if message.get("status") != 0:
+            failures.append(message)
+    writer.close()
+    await writer.wait_closed()
+
+
+async def load_test(args: argparse.Namespace, source: str) -> None:
+    latencies, failures = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(args.host, args.port, args.unix, source, args.requests, latencies, failures)
+        for _ in range(args.concurrency)
+    ))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    p50 = statistics.median(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{len(latencies)} requests, {len(failures)} failed, {args.concurrency} connections: "
+        f"{len(latencies) / elapsed:.1f} req/s, p50 {p50 * 1e3:.1f} ms, p99 {p99 * 1e3:.1f} ms"
+    )
+    if failures:
+        print(f"first failure: {failures[0]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a running lox_server.py.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", metavar="PATH")
+    parser.add_argument("-c", "--concurrency", type=int, default=8, help="connections, each sending requests in turn")
+    parser.add_argument("-n", "--requests", type=int, default=50, help="requests per connection")
+    parser.add_argument("--script", help="Lox file to submit instead of the built-in fib(15)")
+    args = parser.parse_args()
+
+    source = SOURCE
+    if args.script:
+        with open(args.script) as f:
+            source = f.read()
+    asyncio.run(load_test(args, source))
@@ -0,0 +1,74 @@
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import LoxSession
+
+
+# "functions" declares a global function in every chunk, so whatever the
+# runner does its memory grows with the script. "blocks" keeps no globals, so
+# run_stream should stay flat however many chunks there are.
+CHUNKS = {
+    "functions": [
+        "var v{n} = {n};",
+        "fun f{n}(a) {{ var b = a * 2; return b + v{n}; }}",
+        "print f{n}(v{n}) - v{n};",
+    ],
+    "blocks": [
+        "{{ var a = {n}; var b = a * 2; print b - a; }}",
+    ],
+}
+
+
+def generate_script(chunk: list[str], chunks: int) -> str:
+    return "".join(line.format(n=n) + "\n" for n in range(chunks) for line in chunk)
+
+
+class FirstWrite(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.first = None
+
+    def write(self, text: str) -> int:
+        if self.first is None:
+            self.first = time.perf_counter()
+        return len(text)
+
+
+def measure(path: str, stream: bool):
+    session = LoxSession()
+    out = FirstWrite()
+    stdout, sys.stdout = sys.stdout, out
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        with open(path) as f:
+            if stream:
+                session.run_stream(f)
+            else:
+                session.run(f.read())
+    finally:
+        end = time.perf_counter()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        sys.stdout = stdout
+    return out.first - start, end - start, peak
+
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for kind, chunk in CHUNKS.items():
+        with tempfile.NamedTemporaryFile("w", suffix=".lox", delete=False) as f:
+            f.write(generate_script(chunk, chunks))
+        try:
+            print(f"{kind}: {chunks * len(chunk)} top-level statements, {os.path.getsize(f.name) / 2**20:.1f} MiB")
+            for name, stream in (("run", False), ("run_stream", True)):
+                first, total, peak = measure(f.name, stream)
+                print(f"  {name:<11} first output {first * 1e3:8.1f} ms   total {total:6.2f} s   peak {peak / 2**20:7.1f} MiB")
+        finally:
+            os.unlink(f.name)
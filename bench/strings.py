@@ -0,0 +1,33 @@
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import BACKENDS, LoxSession
+
+
+def builder(pieces: int) -> str:
+    return f"""
+var out = "";
+for (var i = 0; i < {pieces}; i = i + 1) {{ out = out + "line of output\\n"; }}
+print out == "";
+"""
+
+
+def run(source: str, backend: str) -> float:
+    session = LoxSession(backend)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.run(source)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    # Linear growth in time per doubling means concatenation is O(1) amortized.
+    for backend in BACKENDS:
+        print(backend)
+        for pieces in (10000, 20000, 40000, 80000):
+            print(f"  {pieces:>6} appends  {run(builder(pieces), backend) * 1e3:9.1f} ms")
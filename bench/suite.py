@@ -0,0 +1,116 @@
+import argparse
+import glob
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ast_memory import generate_source
+from lox import BACKENDS, OPT_LEVEL, LoxSession
+
+
+PROGRAMS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "programs")
+PHASES = ["scan", "parse", "resolve", "optimize", "execute"]
+GENERATED_LINES = 20000
+
+
+def load_programs() -> dict[str, str]:
+    programs = {}
+    for path in sorted(glob.glob(os.path.join(PROGRAMS, "*.lox"))):
+        with open(path) as f:
+            programs[os.path.splitext(os.path.basename(path))[0]] = f.read()
+    # Only declares functions, so nearly all of its time is scanning and parsing.
+    programs["large_source"] = generate_source(GENERATED_LINES)
+    return programs
+
+
+def measure(source: str, backend: str, opt_level: int) -> dict[str, float]:
+    session = LoxSession(backend, io.StringIO())
+    # Memoization would reduce fib to a few dozen calls on the tree-walker
+    # alone, so the programs would measure different work on each backend.
+    session.interpreter.memo_size = 0
+    session.phase_times = {}
+    session.run(source, opt_level=opt_level)
+    if session.had_error or session.had_runtime_error:
+        raise RuntimeError("benchmark program failed")
+    return session.phase_times
+
+
+def summarize(samples: list[float]) -> dict:
+    return {
+        "median": statistics.median(samples),
+        "stdev": statistics.stdev(samples) if len(samples) > 1 else 0.0,
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def run_suite(backends: list[str], opt_level: int, repeat: int, only: list[str]) -> dict:
+    results = {}
+    for name, source in load_programs().items():
+        if only and name not in only:
+            continue
+        for backend in backends:
+            runs = [measure(source, backend, opt_level) for _ in range(repeat)]
+            phases = {phase: summarize([run.get(phase, 0.0) for run in runs]) for phase in PHASES}
+            phases["total"] = summarize([sum(run.values()) for run in runs])
+            results[f"{name}/{backend}"] = phases
+            print_row(f"{name}/{backend}", phases)
+    return results
+
+
+def print_row(label: str, phases: dict) -> None:
+    cells = "".join(
+        f"{phases[phase]['median'] * 1e3:9.1f}{spread(phases[phase]):>7}" for phase in PHASES + ["total"]
+    )
+    print(f"{label:<32}{cells}")
+
+
+def spread(summary: dict) -> str:
+    # Standard deviation relative to the median.
+    if summary["median"] == 0:
+        return ""
+    return f"±{100 * summary['stdev'] / summary['median']:.0f}%"
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"\n{'vs baseline (total median)':<32}{'before ms':>10}{'after ms':>10}{'ratio':>8}")
+    for label, phases in results.items():
+        if label not in baseline:
+            continue
+        before = baseline[label]["total"]["median"]
+        after = phases["total"]["median"]
+        print(f"{label:<32}{before * 1e3:10.1f}{after * 1e3:10.1f}{after / before:8.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each phase of the benchmark programs through LoxSession.run.")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="repeat to run several; default all")
+    parser.add_argument("-O", "--opt-level", type=int, choices=[0, 1, 2], default=OPT_LEVEL)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", action="append", default=[], metavar="PROGRAM", help="run just this program; repeatable")
+    parser.add_argument("--output", metavar="JSON", help="save the results here")
+    parser.add_argument("--compare", metavar="JSON", help="print the change against earlier saved results")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(10000)
+    backends = args.backend or sorted(BACKENDS)
+    print(f"{'median ms ±stdev':<32}" + "".join(f"{phase:>16}" for phase in PHASES + ["total"]))
+    results = run_suite(backends, args.opt_level, args.repeat, args.only)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "opt_level": args.opt_level,
+                "repeat": args.repeat,
+                "results": results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f)["results"])
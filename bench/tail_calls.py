@@ -0,0 +1,40 @@
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lox import BACKENDS, LoxSession
+
+
+SOURCE = """
+fun count(n, acc) {{
+  if (n == 0) return acc;
+  return count(n - 1, acc + 1);
+}}
+print count({n}, 0);
+"""
+
+
+def run(depth: int, backend: str) -> tuple[float, int]:
+    session = LoxSession(backend)
+    tracemalloc.start()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        session.run(SOURCE.format(n=depth))
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+if __name__ == "__main__":
+    depths = [int(arg) for arg in sys.argv[1:]] or [1000, 10000, 100000]
+    for backend in BACKENDS:
+        print(backend)
+        for depth in depths:
+            elapsed, peak = run(depth, backend)
+            print(f"  depth {depth:>8}  {elapsed:7.2f} s  peak {peak / 2**10:8.1f} KiB")
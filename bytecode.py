@@ -0,0 +1,115 @@
+from typing import Any
+from token_ import Token
+
+
+OP_CONSTANT = 0
+OP_NIL = 1
+OP_TRUE = 2
+OP_FALSE = 3
+OP_POP = 4
+OP_GET_LOCAL = 5
+OP_SET_LOCAL = 6
+OP_GET_GLOBAL = 7
+OP_DEFINE_GLOBAL = 8
+OP_SET_GLOBAL = 9
+OP_GET_UPVALUE = 10
+OP_SET_UPVALUE = 11
+OP_EQUAL = 12
+OP_NOT_EQUAL = 13
+OP_GREATER = 14
+OP_GREATER_EQUAL = 15
+OP_LESS = 16
+OP_LESS_EQUAL = 17
+OP_ADD = 18
+OP_SUBTRACT = 19
+OP_MULTIPLY = 20
+OP_DIVIDE = 21
+OP_NOT = 22
+OP_NEGATE = 23
+OP_PRINT = 24
+OP_JUMP = 25
+OP_JUMP_IF_FALSE = 26
+OP_POP_JUMP_IF_FALSE = 27
+OP_LOOP = 28
+OP_CALL = 29
+OP_CLOSURE = 30
+OP_CLOSE_UPVALUE = 31
+OP_RETURN = 32
+# Pops a while loop's condition and leaves the loop if it is false, or else
+# burns the iteration's fuel, as the tree-walkers do on entering the body.
+OP_ITERATE = 33
+# A call in tail position. A Closure callee takes over the caller's frame; any
+# other callee is called as by OP_CALL, and the OP_RETURN after it returns.
+OP_TAIL_CALL = 34
+
+OP_NAMES = {value: name for name, value in dict(globals()).items() if name.startswith("OP_")}
+
+# Opcodes followed by a single inline operand.
+OPERAND_OPS = {
+    OP_CONSTANT, OP_GET_LOCAL, OP_SET_LOCAL, OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL,
+    OP_GET_UPVALUE, OP_SET_UPVALUE, OP_JUMP, OP_JUMP_IF_FALSE, OP_POP_JUMP_IF_FALSE, OP_LOOP, OP_CALL,
+    OP_ITERATE, OP_TAIL_CALL,
+}
+
+
+class BytecodeFunction:
+    def __init__(self, name: str, arity: int):
+        self.name = name
+        self.arity = arity
+        self.chunk = Chunk()
+        self.upvalue_count = 0
+
+    def __str__(self):
+        if self.name is None:
+            return "<script>"
+        return f"<fn {self.name}>"
+
+
+class Chunk:
+    def __init__(self):
+        self.code = []
+        self.constants = []
+        self.tokens = []
+        self.constant_index = {}
+
+    def write(self, byte: int, token: Token) -> None:
+        self.code.append(byte)
+        self.tokens.append(token)
+
+    def add_constant(self, value: Any) -> int:
+        key = (type(value), value)
+        index = self.constant_index.get(key)
+        if index is None:
+            index = len(self.constants)
+            self.constants.append(value)
+            self.constant_index[key] = index
+        return index
+
+    def line(self, offset: int) -> int:
+        token = self.tokens[offset]
+        return token.line if token is not None else 0
+
+    def disassemble(self, name: str) -> str:
+        lines = [f"== {name} =="]
+        offset = 0
+        while offset < len(self.code):
+            op = self.code[offset]
+            text = f"{offset:04d} {self.line(offset):4d} {OP_NAMES[op]}"
+            if op in OPERAND_OPS:
+                operand = self.code[offset + 1]
+                text += f" {operand}"
+                if op == OP_CONSTANT or op in (OP_GET_GLOBAL, OP_DEFINE_GLOBAL, OP_SET_GLOBAL):
+                    text += f" '{self.constants[operand]}'"
+                offset += 2
+            elif op == OP_CLOSURE:
+                function = self.constants[self.code[offset + 1]]
+                text += f" {self.code[offset + 1]} {function}"
+                offset += 2
+                for _ in range(function.upvalue_count):
+                    is_local, index = self.code[offset], self.code[offset + 1]
+                    text += f" {'local' if is_local else 'upvalue'}:{index}"
+                    offset += 2
+            else:
+                offset += 1
+            lines.append(text)
+        return "\n".join(lines)
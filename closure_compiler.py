@@ -0,0 +1,395 @@
+import operator
+from typing import Callable
+from environment import Environment
+from expr import Assign, Binary, Call, Expr, Grouping, Literal, Logical, Unary, Variable
+from expr import Visitor as ExprVisitor
+from interpreter import Interpreter
+from lox_callable import LoxCallable
+from lox_function import TailCall
+from return_exception import Return
+from rope import STRING_TYPES, concat
+from runtime_error import LoxRuntimeError, NativeError
+from stmt import Block, Expression, Function, If, Print, Stmt, Var, While
+from stmt import Visitor as StmtVisitor
+from token_type import TokenType
+
+
+NUMBER_OPS = {
+    TokenType.GREATER: operator.gt,
+    TokenType.GREATER_EQUAL: operator.ge,
+    TokenType.LESS: operator.lt,
+    TokenType.LESS_EQUAL: operator.le,
+    TokenType.MINUS: operator.sub,
+    TokenType.SLASH: operator.truediv,
+    TokenType.STAR: operator.mul,
+}
+
+
+class CompiledFunction(LoxCallable):
+    def __init__(self, declaration: Function, body: Callable, closure: Environment):
+        self.declaration = declaration
+        self.param_count = len(declaration.params)
+        self.body = body
+        self.closure = closure
+
+    def __str__(self):
+        return f"<fn {self.declaration.name.lexeme}>"
+
+    def arity(self):
+        return self.param_count
+
+    def call_(self, interpreter, arguments):
+        # A return in tail position hands back a TailCall instead of calling,
+        # and this loop runs it without growing the Python stack.
+        function = self
+        while True:
+            try:
+                function.body(Environment(function.closure, arguments))
+                return None
+            except Return as r:
+                value = r.value
+            if type(value) is not TailCall:
+                return value
+            function = value.function
+            arguments = value.arguments
+
+
+# Every compiled node is a Python closure taking the current Environment, so
+# execution skips the accept/visit_* dispatch and the operator match.
+class ClosureCompiler(ExprVisitor, StmtVisitor):
+    def __init__(self, interpreter: Interpreter):
+        self.interpreter = interpreter
+        self.scope_depth = 0
+
+    def compile(self, statements: list[Stmt]) -> Callable:
+        return self.compile_sequence(statements)
+
+    def compile_statement(self, stmt: Stmt) -> Callable:
+        return stmt.accept(self)
+
+    def compile_expression(self, expr: Expr) -> Callable:
+        return expr.accept(self)
+
+    def compile_sequence(self, statements: list[Stmt]) -> Callable:
+        compiled = [self.compile_statement(statement) for statement in statements]
+
+        if len(compiled) == 1:
+            return compiled[0]
+
+        def run(env):
+            for statement in compiled:
+                statement(env)
+        return run
+
+    def define(self, name: str, value: Callable) -> Callable:
+        if self.scope_depth > 0:
+            # The slot exists before the initializer runs, which may assign it.
+            def run(env):
+                values = env.values
+                slot = len(values)
+                values.append(None)
+                values[slot] = value(env)
+            return run
+
+        globals_ = self.interpreter.globals.values
+
+        def run(env):
+            globals_[name] = value(env)
+        return run
+
+    def visit_block_stmt(self, stmt: Block) -> Callable:
+        self.scope_depth += 1
+        body = self.compile_sequence(stmt.statements)
+        self.scope_depth -= 1
+
+        def run(env):
+            body(Environment(env))
+        return run
+
+    def visit_expression_stmt(self, stmt: Expression) -> Callable:
+        return self.compile_expression(stmt.expression)
+
+    def visit_function_stmt(self, stmt: Function) -> Callable:
+        self.scope_depth += 1
+        body = self.compile_sequence(stmt.body)
+        self.scope_depth -= 1
+
+        def function(env):
+            return CompiledFunction(stmt, body, env)
+        return self.define(stmt.name.lexeme, function)
+
+    def visit_if_stmt(self, stmt: If) -> Callable:
+        condition = self.compile_expression(stmt.condition)
+        then_branch = self.compile_statement(stmt.then_branch)
+
+        if stmt.else_branch is None:
+            def run(env):
+                value = condition(env)
+                if value is not None and value is not False:
+                    then_branch(env)
+            return run
+
+        else_branch = self.compile_statement(stmt.else_branch)
+
+        def run(env):
+            value = condition(env)
+            if value is not None and value is not False:
+                then_branch(env)
+            else:
+                else_branch(env)
+        return run
+
+    def visit_print_stmt(self, stmt: Print) -> Callable:
+        expression = self.compile_expression(stmt.expression)
+        stringify = self.interpreter.stringify
+        out = self.interpreter.out
+
+        def run(env):
+            print(stringify(expression(env)), file=out)
+        return run
+
+    def visit_return_stmt(self, stmt) -> Callable:
+        if stmt.value is None:
+            def run(env):
+                raise Return(None)
+            return run
+
+        if stmt.value in self.interpreter.tail_calls:
+            return self.compile_tail_call(stmt.value)
+
+        value = self.compile_expression(stmt.value)
+
+        def run(env):
+            raise Return(value(env))
+        return run
+
+    # Checked like any other call, but a compiled callee is left for the
+    # caller's CompiledFunction.call_ to run.
+    def compile_tail_call(self, expr: Call) -> Callable:
+        callee = self.compile_expression(expr.callee)
+        arguments = [self.compile_expression(argument) for argument in expr.arguments]
+        paren = expr.paren
+        interpreter = self.interpreter
+
+        def run(env):
+            function = callee(env)
+            values = [argument(env) for argument in arguments]
+
+            if not isinstance(function, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+            if len(values) != function.arity():
+                raise LoxRuntimeError(paren, f"Expected {function.arity()} arguments but got {len(values)}")
+
+            interpreter.fuel -= 1
+            if interpreter.fuel <= 0:
+                interpreter.refuel(paren)
+            if type(function) is CompiledFunction:
+                raise Return(TailCall(function, values))
+            try:
+                raise Return(function.call_(interpreter, values))
+            except NativeError as e:
+                raise LoxRuntimeError(paren, str(e))
+        return run
+
+    def visit_var_stmt(self, stmt: Var) -> Callable:
+        if stmt.initializer is None:
+            return self.define(stmt.name.lexeme, self.visit_literal_expr(Literal(None)))
+
+        return self.define(stmt.name.lexeme, self.compile_expression(stmt.initializer))
+
+    def visit_while_stmt(self, stmt: While) -> Callable:
+        condition = self.compile_expression(stmt.condition)
+        body = self.compile_statement(stmt.body)
+        keyword = stmt.keyword
+        interpreter = self.interpreter
+
+        def run(env):
+            while True:
+                value = condition(env)
+                if value is None or value is False:
+                    return
+                interpreter.fuel -= 1
+                if interpreter.fuel <= 0:
+                    interpreter.refuel(keyword)
+                body(env)
+        return run
+
+    def visit_assign_expr(self, expr: Assign) -> Callable:
+        name = expr.name
+        lexeme = name.lexeme
+        value = self.compile_expression(expr.value)
+        resolved = self.interpreter.locals.get(expr)
+
+        if resolved is None:
+            globals_ = self.interpreter.globals.values
+
+            def run(env):
+                result = value(env)
+                if lexeme not in globals_:
+                    raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'.")
+                globals_[lexeme] = result
+                return result
+            return run
+
+        distance, slot = resolved
+        if distance == 0:
+            def run(env):
+                result = env.values[slot] = value(env)
+                return result
+        else:
+            def run(env):
+                result = env.ancestor(distance).values[slot] = value(env)
+                return result
+        return run
+
+    def visit_binary_expr(self, expr: Binary) -> Callable:
+        left = self.compile_expression(expr.left)
+        right = self.compile_expression(expr.right)
+        operator_ = expr.operator
+
+        match operator_.type:
+            case TokenType.PLUS:
+                def run(env):
+                    l = left(env)
+                    r = right(env)
+                    if type(l) is float and type(r) is float:
+                        return l + r
+                    if type(l) in STRING_TYPES and type(r) in STRING_TYPES:
+                        return concat(l, r)
+                    raise LoxRuntimeError(operator_, "Operands must be two numbers or two strings.")
+            case TokenType.EQUAL_EQUAL:
+                is_equal = self.interpreter.is_equal
+
+                def run(env):
+                    return is_equal(left(env), right(env))
+            case TokenType.BANG_EQUAL:
+                is_equal = self.interpreter.is_equal
+
+                def run(env):
+                    return not is_equal(left(env), right(env))
+            case _:
+                op = NUMBER_OPS[operator_.type]
+
+                if isinstance(expr.right, Literal) and type(expr.right.value) is float:
+                    constant = expr.right.value
+
+                    def run(env):
+                        l = left(env)
+                        if type(l) is float:
+                            return op(l, constant)
+                        raise LoxRuntimeError(operator_, "Operands must be numbers.")
+                else:
+                    def run(env):
+                        l = left(env)
+                        r = right(env)
+                        if type(l) is float and type(r) is float:
+                            return op(l, r)
+                        raise LoxRuntimeError(operator_, "Operands must be numbers.")
+        return run
+
+    def visit_call_expr(self, expr: Call) -> Callable:
+        callee = self.compile_expression(expr.callee)
+        arguments = [self.compile_expression(argument) for argument in expr.arguments]
+        paren = expr.paren
+        interpreter = self.interpreter
+
+        def run(env):
+            function = callee(env)
+            values = [argument(env) for argument in arguments]
+
+            if not isinstance(function, LoxCallable):
+                raise LoxRuntimeError(paren, "Can only call functions and classes.")
+
+            if len(values) != function.arity():
+                raise LoxRuntimeError(paren, f"Expected {function.arity()} arguments but got {len(values)}")
+
+            interpreter.fuel -= 1
+            if interpreter.fuel <= 0:
+                interpreter.refuel(paren)
+            try:
+                return function.call_(interpreter, values)
+            except NativeError as e:
+                raise LoxRuntimeError(paren, str(e))
+        return run
+
+    def visit_grouping_expr(self, expr: Grouping) -> Callable:
+        return self.compile_expression(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal) -> Callable:
+        value = expr.value
+
+        def run(env):
+            return value
+        return run
+
+    def visit_logical_expr(self, expr: Logical) -> Callable:
+        left = self.compile_expression(expr.left)
+        right = self.compile_expression(expr.right)
+
+        if expr.operator.type == TokenType.OR:
+            def run(env):
+                value = left(env)
+                if value is not None and value is not False:
+                    return value
+                return right(env)
+        else:
+            def run(env):
+                value = left(env)
+                if value is None or value is False:
+                    return value
+                return right(env)
+        return run
+
+    def visit_unary_expr(self, expr: Unary) -> Callable:
+        right = self.compile_expression(expr.right)
+        operator_ = expr.operator
+
+        if operator_.type == TokenType.BANG:
+            def run(env):
+                value = right(env)
+                return value is None or value is False
+            return run
+
+        def run(env):
+            value = right(env)
+            if type(value) is float:
+                return -value
+            raise LoxRuntimeError(operator_, "Operand must be a number.")
+        return run
+
+    def visit_variable_expr(self, expr: Variable) -> Callable:
+        name = expr.name
+        lexeme = name.lexeme
+        resolved = self.interpreter.locals.get(expr)
+
+        if resolved is None:
+            globals_ = self.interpreter.globals.values
+
+            def run(env):
+                try:
+                    return globals_[lexeme]
+                except KeyError:
+                    raise LoxRuntimeError(name, f"Undefined variable '{lexeme}'.")
+            return run
+
+        distance, slot = resolved
+        if distance == 0:
+            def run(env):
+                return env.values[slot]
+        elif distance == 1:
+            def run(env):
+                return env.enclosing.values[slot]
+        else:
+            def run(env):
+                return env.ancestor(distance).values[slot]
+        return run
+
+
+class ClosureInterpreter(Interpreter):
+    def interpret(self, statements: list[Stmt], source: str = None, opt_level: int = 0) -> None:
+        program = ClosureCompiler(self).compile(statements)
+        try:
+            program(self.globals)
+        except LoxRuntimeError as e:
+            self.diagnostics.runtime_error(e)
@@ -0,0 +1,293 @@
+from typing import Any
+from bytecode import (
+    BytecodeFunction, OP_ADD, OP_CALL, OP_CLOSE_UPVALUE, OP_CLOSURE, OP_CONSTANT, OP_DEFINE_GLOBAL, OP_DIVIDE,
+    OP_EQUAL, OP_FALSE, OP_GET_GLOBAL, OP_GET_LOCAL, OP_GET_UPVALUE, OP_GREATER, OP_GREATER_EQUAL, OP_ITERATE,
+    OP_JUMP, OP_JUMP_IF_FALSE, OP_LESS, OP_LESS_EQUAL, OP_LOOP, OP_MULTIPLY, OP_NEGATE, OP_NIL, OP_NOT,
+    OP_NOT_EQUAL, OP_POP, OP_POP_JUMP_IF_FALSE, OP_PRINT, OP_RETURN, OP_SET_GLOBAL, OP_SET_LOCAL, OP_SET_UPVALUE,
+    OP_SUBTRACT, OP_TAIL_CALL, OP_TRUE,
+)
+from expr import Assign, Binary, Call, Expr, Grouping, Literal, Logical, Unary, Variable
+from expr import Visitor as ExprVisitor
+from stmt import Block, Expression, Function, If, Print, Return, Stmt, Var, While
+from stmt import Visitor as StmtVisitor
+from token_type import TokenType
+from token_ import Token
+
+
+BINARY_OPS = {
+    TokenType.GREATER: OP_GREATER,
+    TokenType.GREATER_EQUAL: OP_GREATER_EQUAL,
+    TokenType.LESS: OP_LESS,
+    TokenType.LESS_EQUAL: OP_LESS_EQUAL,
+    TokenType.BANG_EQUAL: OP_NOT_EQUAL,
+    TokenType.EQUAL_EQUAL: OP_EQUAL,
+    TokenType.MINUS: OP_SUBTRACT,
+    TokenType.PLUS: OP_ADD,
+    TokenType.SLASH: OP_DIVIDE,
+    TokenType.STAR: OP_MULTIPLY,
+}
+
+
+class Local:
+    def __init__(self, owner: "FunctionState", slot: int):
+        self.owner = owner
+        self.slot = slot
+        self.is_captured = False
+
+
+class FunctionState:
+    def __init__(self, function: BytecodeFunction, enclosing: "FunctionState"):
+        self.function = function
+        self.enclosing = enclosing
+        # Slot 0 holds the closure being called.
+        self.slot_count = 1
+        self.upvalues = []
+
+    def add_upvalue(self, is_local: bool, index: int) -> int:
+        upvalue = (is_local, index)
+        if upvalue in self.upvalues:
+            return self.upvalues.index(upvalue)
+
+        self.upvalues.append(upvalue)
+        self.function.upvalue_count = len(self.upvalues)
+        return len(self.upvalues) - 1
+
+
+class Compiler(ExprVisitor, StmtVisitor):
+    def __init__(self, locals_: dict, tail_calls: set = frozenset()):
+        self.locals = locals_
+        self.tail_calls = tail_calls
+        self.state = None
+        self.scopes = []
+        self.token = None
+        self.initializing = None
+
+    def compile(self, statements: list[Stmt]) -> BytecodeFunction:
+        self.state = FunctionState(BytecodeFunction(None, 0), None)
+        for statement in statements:
+            self.compile_statement(statement)
+        self.emit(OP_NIL)
+        self.emit(OP_RETURN)
+        return self.state.function
+
+    def compile_statement(self, stmt: Stmt) -> None:
+        stmt.accept(self)
+
+    def compile_expression(self, expr: Expr) -> None:
+        expr.accept(self)
+
+    @property
+    def chunk(self):
+        return self.state.function.chunk
+
+    def emit(self, *bytes_: int) -> None:
+        for byte in bytes_:
+            self.chunk.write(byte, self.token)
+
+    def emit_constant(self, value: Any) -> None:
+        self.emit(OP_CONSTANT, self.chunk.add_constant(value))
+
+    def emit_jump(self, op: int) -> int:
+        self.emit(op, 0)
+        return len(self.chunk.code) - 1
+
+    def patch_jump(self, offset: int) -> None:
+        self.chunk.code[offset] = len(self.chunk.code) - offset - 1
+
+    def emit_loop(self, loop_start: int) -> None:
+        self.emit(OP_LOOP, 0)
+        self.chunk.code[-1] = len(self.chunk.code) - 1 - loop_start
+
+    def begin_scope(self) -> None:
+        self.scopes.append({})
+
+    def end_scope(self) -> None:
+        scope = self.scopes.pop()
+        for local in reversed(scope.values()):
+            self.emit(OP_CLOSE_UPVALUE if local.is_captured else OP_POP)
+        self.state.slot_count -= len(scope)
+
+    def declare(self, name: Token) -> None:
+        if len(self.scopes) == 0:
+            return
+
+        self.scopes[-1][name.lexeme] = Local(self.state, self.state.slot_count)
+        self.state.slot_count += 1
+
+    def define(self, name: Token) -> None:
+        if len(self.scopes) == 0:
+            self.token = name
+            self.emit(OP_DEFINE_GLOBAL, self.chunk.add_constant(name.lexeme))
+
+    def resolve_variable(self, expr: Expr, name: Token) -> tuple[int, int, int]:
+        resolved = self.locals.get(expr)
+        if resolved is None:
+            return OP_GET_GLOBAL, OP_SET_GLOBAL, self.chunk.add_constant(name.lexeme)
+
+        local = self.find_local(name, resolved[0])
+        if local.owner is self.state:
+            return OP_GET_LOCAL, OP_SET_LOCAL, local.slot
+
+        return OP_GET_UPVALUE, OP_SET_UPVALUE, self.resolve_upvalue(self.state, local)
+
+    def find_local(self, name: Token, depth: int) -> Local:
+        if len(self.scopes) == 0:
+            return None
+        return self.scopes[len(self.scopes) - 1 - depth][name.lexeme]
+
+    def resolve_upvalue(self, state: FunctionState, local: Local) -> int:
+        if state.enclosing is local.owner:
+            local.is_captured = True
+            return state.add_upvalue(True, local.slot)
+
+        return state.add_upvalue(False, self.resolve_upvalue(state.enclosing, local))
+
+    def visit_block_stmt(self, stmt: Block) -> None:
+        self.begin_scope()
+        for statement in stmt.statements:
+            self.compile_statement(statement)
+        self.end_scope()
+
+    def visit_expression_stmt(self, stmt: Expression) -> None:
+        self.compile_expression(stmt.expression)
+        self.emit(OP_POP)
+
+    def visit_function_stmt(self, stmt: Function) -> None:
+        self.declare(stmt.name)
+
+        function = BytecodeFunction(stmt.name.lexeme, len(stmt.params))
+        enclosing_state, enclosing_scopes = self.state, len(self.scopes)
+        self.state = FunctionState(function, enclosing_state)
+        self.begin_scope()
+        for param in stmt.params:
+            self.declare(param)
+        for statement in stmt.body:
+            self.compile_statement(statement)
+        self.token = stmt.name
+        self.emit(OP_NIL)
+        self.emit(OP_RETURN)
+        del self.scopes[enclosing_scopes:]
+
+        upvalues = self.state.upvalues
+        self.state = enclosing_state
+        self.token = stmt.name
+        self.emit(OP_CLOSURE, self.chunk.add_constant(function))
+        for is_local, index in upvalues:
+            self.emit(1 if is_local else 0, index)
+
+        self.define(stmt.name)
+
+    def visit_if_stmt(self, stmt: If) -> None:
+        self.compile_expression(stmt.condition)
+        then_jump = self.emit_jump(OP_POP_JUMP_IF_FALSE)
+        self.compile_statement(stmt.then_branch)
+
+        if stmt.else_branch is None:
+            self.patch_jump(then_jump)
+            return
+
+        else_jump = self.emit_jump(OP_JUMP)
+        self.patch_jump(then_jump)
+        self.compile_statement(stmt.else_branch)
+        self.patch_jump(else_jump)
+
+    def visit_print_stmt(self, stmt: Print) -> None:
+        self.compile_expression(stmt.expression)
+        self.emit(OP_PRINT)
+
+    def visit_return_stmt(self, stmt: Return) -> None:
+        if stmt.value is None:
+            self.token = stmt.keyword
+            self.emit(OP_NIL)
+        elif stmt.value in self.tail_calls:
+            self.visit_call_expr(stmt.value, OP_TAIL_CALL)
+        else:
+            self.compile_expression(stmt.value)
+        self.token = stmt.keyword
+        self.emit(OP_RETURN)
+
+    def visit_var_stmt(self, stmt: Var) -> None:
+        # Declared first so that the initializer can assign the local. Its slot
+        # is where the initializer's value ends up, so such a store is dropped.
+        self.declare(stmt.name)
+        enclosing, self.initializing = self.initializing, self.find_local(stmt.name, 0)
+        if stmt.initializer is None:
+            self.token = stmt.name
+            self.emit(OP_NIL)
+        else:
+            self.compile_expression(stmt.initializer)
+        self.initializing = enclosing
+
+        self.define(stmt.name)
+
+    def visit_while_stmt(self, stmt: While) -> None:
+        loop_start = len(self.chunk.code)
+        self.compile_expression(stmt.condition)
+        self.token = stmt.keyword
+        exit_jump = self.emit_jump(OP_ITERATE)
+        self.compile_statement(stmt.body)
+        self.emit_loop(loop_start)
+        self.patch_jump(exit_jump)
+
+    def visit_assign_expr(self, expr: Assign) -> None:
+        self.compile_expression(expr.value)
+        resolved = self.locals.get(expr)
+        if resolved is not None and self.find_local(expr.name, resolved[0]) is self.initializing:
+            return
+        _, set_op, arg = self.resolve_variable(expr, expr.name)
+        self.token = expr.name
+        self.emit(set_op, arg)
+
+    def visit_binary_expr(self, expr: Binary) -> None:
+        self.compile_expression(expr.left)
+        self.compile_expression(expr.right)
+        self.token = expr.operator
+        self.emit(BINARY_OPS[expr.operator.type])
+
+    def visit_call_expr(self, expr: Call, op: int = OP_CALL) -> None:
+        self.compile_expression(expr.callee)
+        for argument in expr.arguments:
+            self.compile_expression(argument)
+        self.token = expr.paren
+        self.emit(op, len(expr.arguments))
+
+    def visit_grouping_expr(self, expr: Grouping) -> None:
+        self.compile_expression(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal) -> None:
+        if expr.value is None:
+            self.emit(OP_NIL)
+        elif expr.value is True:
+            self.emit(OP_TRUE)
+        elif expr.value is False:
+            self.emit(OP_FALSE)
+        else:
+            self.emit_constant(expr.value)
+
+    def visit_logical_expr(self, expr: Logical) -> None:
+        self.compile_expression(expr.left)
+        self.token = expr.operator
+
+        if expr.operator.type == TokenType.AND:
+            end_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+            self.emit(OP_POP)
+            self.compile_expression(expr.right)
+            self.patch_jump(end_jump)
+            return
+
+        else_jump = self.emit_jump(OP_JUMP_IF_FALSE)
+        end_jump = self.emit_jump(OP_JUMP)
+        self.patch_jump(else_jump)
+        self.emit(OP_POP)
+        self.compile_expression(expr.right)
+        self.patch_jump(end_jump)
+
+    def visit_unary_expr(self, expr: Unary) -> None:
+        self.compile_expression(expr.right)
+        self.token = expr.operator
+        self.emit(OP_NOT if expr.operator.type == TokenType.BANG else OP_NEGATE)
+
+    def visit_variable_expr(self, expr: Variable) -> None:
+        get_op, _, arg = self.resolve_variable(expr, expr.name)
+        self.token = expr.name
+        self.emit(get_op, arg)
@@ -0,0 +1,30 @@
+from runtime_error import LoxRuntimeError
+from token_type import TokenType
+from token_ import Token
+
+
+# Collects the errors of one Lox session and prints them to its output sink;
+# out=None prints to whatever sys.stdout is at the time. The scanners, the
+# parser and the interpreters report through the instance they were given.
+class Diagnostics:
+    def __init__(self, out=None):
+        self.out = out
+        self.had_error = False
+        self.had_runtime_error = False
+
+    def error(self, line: int, message: str) -> None:
+        self.report(line, "", message)
+
+    def report(self, line: int, where: str, message: str) -> None:
+        print(f"[line {line!s}] Error {where}: {message}", file=self.out)
+        self.had_error = True
+
+    def parse_error(self, token: Token, message: str) -> None:
+        if token.type == TokenType.EOF:
+            self.report(token.line, " at end", message)
+        else:
+            self.report(token.line, f" at '{token.lexeme}'", message)
+
+    def runtime_error(self, error: LoxRuntimeError) -> None:
+        print(f"{error}\n[line {error.token.line}]", file=self.out)
+        self.had_runtime_error = True
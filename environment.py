@@ -3,42 +3,71 @@ from token_ import Token
 from typing import Any
 
 
-class Environment:
-    def __init__(self, enclosing: "Environment" = None):
-        self.values = {}
-        self.enclosing = enclosing
+# A global read site caches the name's cell, which define and assign keep
+# current, so a cached read never goes stale and needs no check. Cells only
+# exist for names something has read through `cell`; the backends that work on
+# `values` directly never do.
+class GlobalCell:
+    __slots__ = ("value",)
 
-    def define(self, name: str, value: Any):
-        self.values[name] = value
+    def __init__(self, value: Any):
+        self.value = value
 
-    def get_at(self, distance: int, name: str) -> Any:
-        return self.ancestor(distance).values[name]
 
-    def assign_at(self, distance: int, name: Token, value: Any):
-        self.ancestor(distance).values[name.lexeme] = value
+class GlobalEnvironment:
+    def __init__(self):
+        self.values = {}
+        self.cells = {}
 
-    def ancestor(self, distance: int) -> "Environment":
-        environment = self
-        for _ in range(distance):
-            environment = environment.enclosing
-        return environment
+    def define(self, name: str, value: Any):
+        self.values[name] = value
+        cell = self.cells.get(name)
+        if cell is not None:
+            cell.value = value
 
     def get(self, name: Token) -> Any:
         if name.lexeme in self.values:
             return self.values[name.lexeme]
 
-        if self.enclosing is not None:
-            return self.enclosing.get(name)
-
         raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
 
+    def cell(self, name: Token) -> GlobalCell:
+        cell = self.cells.get(name.lexeme)
+        if cell is None:
+            cell = self.cells[name.lexeme] = GlobalCell(self.get(name))
+        return cell
+
     def assign(self, name: Token, value: Any) -> None:
         if name.lexeme in self.values:
             self.values[name.lexeme] = value
-            return
-
-        if self.enclosing is not None:
-            self.enclosing.assign(name, value)
+            cell = self.cells.get(name.lexeme)
+            if cell is not None:
+                cell.value = value
             return
 
         raise LoxRuntimeError(name, f"Undefined variable '{name.lexeme}'.")
+
+
+# Local scopes hold their variables in declaration order, so the Resolver's
+# (depth, slot) pair addresses them without hashing the variable name.
+class Environment:
+    __slots__ = ("values", "enclosing")
+
+    def __init__(self, enclosing: "Environment" = None, values: list = None):
+        self.values = [] if values is None else values
+        self.enclosing = enclosing
+
+    def define(self, name: str, value: Any):
+        self.values.append(value)
+
+    def get_at(self, distance: int, slot: int) -> Any:
+        return self.ancestor(distance).values[slot]
+
+    def assign_at(self, distance: int, slot: int, value: Any):
+        self.ancestor(distance).values[slot] = value
+
+    def ancestor(self, distance: int) -> "Environment":
+        environment = self
+        for _ in range(distance):
+            environment = environment.enclosing
+        return environment
@@ -5,18 +5,22 @@ from token_ import Token
 
 
 class Expr(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def accept(self, visitor: "Visitor") -> Any:
         pass
 
-@dataclass(unsafe_hash=True)
+# Nodes are slotted and immutable by convention: passes build new nodes
+# instead of assigning to the fields of existing ones.
+@dataclass(eq=False, slots=True)
 class Assign(Expr):
     name: Token
     value: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_assign_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Binary(Expr):
     left: Expr
     operator: Token
@@ -24,7 +28,7 @@ class Binary(Expr):
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_binary_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Call(Expr):
     callee: Expr
     paren: Token
@@ -32,19 +36,19 @@ class Call(Expr):
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_call_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Grouping(Expr):
     expression: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_grouping_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Literal(Expr):
     value: Any
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_literal_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Logical(Expr):
     left: Expr
     operator: Token
@@ -52,14 +56,14 @@ class Logical(Expr):
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_logical_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Unary(Expr):
     operator: Token
     right: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_unary_expr(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Variable(Expr):
     name: Token
     def accept(self, visitor: 'Visitor') -> Any:
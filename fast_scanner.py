@@ -0,0 +1,169 @@
+import re
+from diagnostics import Diagnostics
+from scanner import Scanner
+from token_type import TokenType
+from token_ import Token
+
+
+CHUNK_SIZE = 1 << 16
+
+OPERATORS = {
+    "(": TokenType.LEFT_PAREN,
+    ")": TokenType.RIGHT_PAREN,
+    "{": TokenType.LEFT_BRACE,
+    "}": TokenType.RIGHT_BRACE,
+    ",": TokenType.COMMA,
+    ".": TokenType.DOT,
+    "-": TokenType.MINUS,
+    "+": TokenType.PLUS,
+    ";": TokenType.SEMICOLON,
+    "*": TokenType.STAR,
+    "/": TokenType.SLASH,
+    "!": TokenType.BANG,
+    "!=": TokenType.BANG_EQUAL,
+    "=": TokenType.EQUAL,
+    "==": TokenType.EQUAL_EQUAL,
+    "<": TokenType.LESS,
+    "<=": TokenType.LESS_EQUAL,
+    ">": TokenType.GREATER,
+    ">=": TokenType.GREATER_EQUAL,
+}
+
+# Leading blanks are folded into every match so that whitespace between tokens
+# does not cost a loop iteration of its own. Alternatives are tried in order
+# of frequency; the two-character operators must come before their
+# one-character prefixes and "/" must not start a comment.
+MASTER = re.compile(r"""
+    [ \t\r]*
+    (?:
+        (?P<identifier>[A-Za-z][A-Za-z0-9]*)
+      | (?P<operator>[!=<>]=|[(){},.\-+;*!=<>]|/(?!/))
+      | (?P<number>[0-9]+(?:\.[0-9]+)?)
+      | (?P<newline>\n+)
+      | (?P<string>"[^"]*")
+      | (?P<comment>//[^\n]*)
+      | (?P<unterminated>"[^"]*\Z)
+      | (?P<end>\Z)
+      | (?P<error>.)
+    )
+""", re.VERBOSE | re.DOTALL)
+
+
+# Table-driven lexer that consumes whole identifiers, numbers, strings and
+# whitespace runs with a single regex match. Produces the same tokens and
+# errors as Scanner; non-ASCII sources fall back to Scanner, whose
+# str.isalpha/isdigit checks accept more than these character classes.
+class FastScanner(Scanner):
+    def scan_tokens(self) -> list[Token]:
+        if not self.source.isascii():
+            return super().scan_tokens()
+
+        diagnostics = self.diagnostics
+        source = self.source
+        buffer = self.buffer
+        tokens = self.tokens
+        keywords = self.keywords
+        line = self.line
+
+        for token_match in MASTER.finditer(source):
+            kind = token_match.lastgroup
+            if kind == "identifier":
+                text = token_match.group(kind)
+                type_ = keywords.get(text, TokenType.IDENTIFIER)
+                literal = None
+            elif kind == "operator":
+                text = token_match.group(kind)
+                type_ = OPERATORS[text]
+                literal = None
+            elif kind == "number":
+                text = token_match.group(kind)
+                type_ = TokenType.NUMBER
+                literal = float(text)
+            elif kind == "newline":
+                line += token_match.end() - token_match.start(kind)
+                continue
+            elif kind == "string":
+                text = token_match.group(kind)
+                type_ = TokenType.STRING
+                line += text.count("\n")
+                literal = text[1:-1]
+            elif kind == "unterminated":
+                line += token_match.group(kind).count("\n")
+                diagnostics.error(line, "Unterminated string.")
+                continue
+            elif kind == "error":
+                diagnostics.error(line, f"Unexpected character: {token_match.group(kind)}")
+                continue
+            else:
+                continue
+
+            if buffer is not None:
+                buffer.add(type_, token_match.start(kind), token_match.end(), line)
+            else:
+                tokens.append(Token(type_, text, literal, line))
+
+        self.line = line
+        self.start = self.current = len(source)
+        self.add_token(TokenType.EOF)
+        return self.tokens
+
+
+# Reads the source from a file object in CHUNK_SIZE pieces and yields tokens as
+# soon as they are complete. A match is only accepted once at least two more
+# characters are buffered behind it, which covers Lox's longest lookahead
+# ("1." versus "1.5") and any token that runs into the end of the buffer.
+class StreamingScanner(FastScanner):
+    def __init__(self, file, chunk_size: int = CHUNK_SIZE, diagnostics: Diagnostics = None):
+        super().__init__("", diagnostics)
+        self.file = file
+        self.chunk_size = chunk_size
+
+    def scan_stream(self):
+        diagnostics = self.diagnostics
+        keywords = self.keywords
+        line = self.line
+        pending = ""
+        position = 0
+        at_eof = False
+
+        while True:
+            token_match = MASTER.match(pending, position)
+            if not at_eof and token_match.end() + 2 > len(pending):
+                chunk = self.file.read(self.chunk_size)
+                if not chunk.isascii():
+                    scanner = Scanner(pending[position:] + chunk + self.file.read(), diagnostics)
+                    scanner.line = line
+                    yield from scanner.scan_tokens()
+                    return
+                at_eof = not chunk
+                pending = pending[position:] + chunk
+                position = 0
+                continue
+
+            position = token_match.end()
+            kind = token_match.lastgroup
+            if kind == "identifier":
+                text = token_match.group(kind)
+                yield Token(keywords.get(text, TokenType.IDENTIFIER), text, None, line)
+            elif kind == "operator":
+                text = token_match.group(kind)
+                yield Token(OPERATORS[text], text, None, line)
+            elif kind == "number":
+                text = token_match.group(kind)
+                yield Token(TokenType.NUMBER, text, float(text), line)
+            elif kind == "newline":
+                line += position - token_match.start(kind)
+            elif kind == "string":
+                text = token_match.group(kind)
+                line += text.count("\n")
+                yield Token(TokenType.STRING, text, text[1:-1], line)
+            elif kind == "unterminated":
+                line += token_match.group(kind).count("\n")
+                diagnostics.error(line, "Unterminated string.")
+            elif kind == "error":
+                diagnostics.error(line, f"Unexpected character: {token_match.group(kind)}")
+            elif kind == "end":
+                break
+
+        self.line = line
+        yield Token(TokenType.EOF, "", None, line)
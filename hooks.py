@@ -0,0 +1,93 @@
+import time
+from collections import Counter
+from expr import Call, Variable
+from stmt import While
+
+
+HOT_TOP = 10
+
+
+# Base class for Interpreter.add_hook: every event is a no-op, so hooks only
+# override the ones they need. Statement and expression events bracket each
+# execute and evaluate; function events bracket each call, native or Lox.
+class Hook:
+    def before_statement(self, interpreter, stmt) -> None:
+        pass
+
+    def after_statement(self, interpreter, stmt) -> None:
+        pass
+
+    def before_expression(self, interpreter, expr) -> None:
+        pass
+
+    def after_expression(self, interpreter, expr, value) -> None:
+        pass
+
+    def enter_function(self, interpreter, function, arguments) -> None:
+        pass
+
+    def exit_function(self, interpreter, function, value) -> None:
+        pass
+
+    def runtime_error(self, interpreter, error) -> None:
+        pass
+
+
+# Counts how often each Stmt and Expr runs and how long it takes including
+# everything beneath it, so nested nodes also count towards their parents.
+class CounterHook(Hook):
+    def __init__(self):
+        self.counts = Counter()
+        self.times = Counter()
+        self.starts = []
+
+    def before_statement(self, interpreter, stmt) -> None:
+        self.starts.append(time.perf_counter())
+
+    def after_statement(self, interpreter, stmt) -> None:
+        self.counts[stmt] += 1
+        self.times[stmt] += time.perf_counter() - self.starts.pop()
+
+    def before_expression(self, interpreter, expr) -> None:
+        self.starts.append(time.perf_counter())
+
+    def after_expression(self, interpreter, expr, value) -> None:
+        self.counts[expr] += 1
+        self.times[expr] += time.perf_counter() - self.starts.pop()
+
+    def runtime_error(self, interpreter, error) -> None:
+        self.starts.clear()
+
+    def report(self, top: int = HOT_TOP) -> str:
+        loops = [node for node in self.times if isinstance(node, While)]
+        calls = [node for node in self.times if isinstance(node, Call)]
+        out = []
+        # Loops are counted by iterations, which is how often the body ran.
+        for title, nodes, label, count in (
+            ("hottest loops", loops, self.loop_label, lambda loop: self.counts[loop.body]),
+            ("hottest call sites", calls, self.call_labels(calls).get, self.counts.get),
+        ):
+            out.append(f"{title:<32}{'count':>10}{'total ms':>12}")
+            for node in sorted(nodes, key=self.times.get, reverse=True)[:top]:
+                out.append(f"  {label(node):<30}{count(node):10}{self.times[node] * 1e3:12.1f}")
+        return "\n".join(out)
+
+    def loop_label(self, loop: While) -> str:
+        return f"{loop.keyword.lexeme} at line {loop.keyword.line}"
+
+    def call_label(self, call: Call) -> str:
+        name = call.callee.name.lexeme if isinstance(call.callee, Variable) else "<expr>"
+        return f"{name}() at line {call.paren.line}"
+
+    def call_labels(self, calls: list[Call]) -> dict[Call, str]:
+        # Call sites that would share a label are numbered in the order they
+        # first returned, e.g. fib() at line 3 #1 and #2 for fib(n - 1) + fib(n - 2).
+        labels = {call: self.call_label(call) for call in calls}
+        shared = Counter(labels.values())
+        ordinals = Counter()
+        for call in calls:
+            label = labels[call]
+            if shared[label] > 1:
+                ordinals[label] += 1
+                labels[call] = f"{label} #{ordinals[label]}"
+        return labels
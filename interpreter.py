@@ -1,18 +1,41 @@
 import time
 from typing import Any
-from environment import Environment
-from expr import Assign, Expr, Grouping, Literal, Logical, Unary, Variable
+from diagnostics import Diagnostics
+from environment import Environment, GlobalEnvironment
+from expr import Assign, Call, Expr, Grouping, Literal, Logical, Unary, Variable
 from expr import Visitor as ExprVisitor
+from lox_array import ARRAY, LoxArray
 from lox_callable import LoxCallable
-from lox_function import LoxFunction
-from return_exception import Return
-from runtime_error import LoxRuntimeError
-from stmt import Block, Expression, If, Print, Stmt, Var, While
+from lox_function import LoxFunction, MemoizedFunction, TailCall
+from rope import STRING_TYPES, concat
+from runtime_error import LoxRuntimeError, NativeError
+from stmt import Block, Expression, Function, If, Print, Stmt, Var, While
 from stmt import Visitor as StmtVisitor
 from token_type import TokenType
 from token_ import Token
 
 
+# Results cached per pure function; 0 turns memoization off.
+MEMO_SIZE = 1024
+
+# Statements complete normally by returning None. A return statement leaves
+# its value in Interpreter.return_value and completes with RETURNED, which
+# blocks, ifs and loops pass straight up to LoxFunction.call_.
+RETURNED = object()
+
+# Native modules whose functions every interpreter defines as globals.
+NATIVE_MODULES = [ARRAY]
+
+# Every loop iteration and call burns one unit of fuel from Interpreter.fuel.
+# Only when that runs out, at most this many steps later, does refuel compare
+# the total against the budget and the clock against the deadline, so the
+# hot paths pay for a decrement and a compare and budgets can stay on.
+FUEL_INTERVAL = 10000
+
+# Global read sites the inline cache holds before it starts over.
+GLOBAL_CACHE_SIZE = 4096
+
+
 class Clock(LoxCallable):
     def arity(self) -> int:
         return 0
@@ -25,14 +48,58 @@ class Clock(LoxCallable):
 
 
 class Interpreter(ExprVisitor, StmtVisitor):
-    def __init__(self) -> None:
-        self.globals = Environment()
+    def __init__(self, diagnostics: Diagnostics = None) -> None:
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
+        self.out = self.diagnostics.out
+        self.globals = GlobalEnvironment()
         self.environment = self.globals
 
         self.globals.define("clock", Clock())
+        for module in NATIVE_MODULES:
+            module.install(self.globals)
 
         self.locals = {}
-
+        self.global_caches = {}
+        self.tail_calls = set()
+        self.return_value = None
+        self.pure_functions = set()
+        self.memo_size = MEMO_SIZE
+        self.memo_hits = 0
+        self.memo_misses = 0
+        self.hooks = []
+
+        self.fuel_limit = None
+        self.time_limit = None
+        self.deadline = None
+        self.fuel_burned = 0
+        self.fuel_granted = FUEL_INTERVAL
+        self.fuel = FUEL_INTERVAL
+
+    def set_budget(self, fuel: int = None, seconds: float = None) -> None:
+        # Either limit may be None for none; the deadline counts from now.
+        self.fuel_limit = fuel
+        self.time_limit = seconds
+        self.deadline = None if seconds is None else time.monotonic() + seconds
+        self.fuel_burned = 0
+        self.grant_fuel()
+
+    def steps(self) -> int:
+        return self.fuel_burned + self.fuel_granted - self.fuel
+
+    def grant_fuel(self) -> None:
+        grant = FUEL_INTERVAL
+        if self.fuel_limit is not None:
+            # One past the limit, so that the first step over it lands here.
+            grant = min(grant, self.fuel_limit - self.fuel_burned + 1)
+        self.fuel_granted = self.fuel = grant
+
+    def refuel(self, token: Token) -> None:
+        self.fuel_burned = self.steps()
+        if self.fuel_limit is not None and self.fuel_burned > self.fuel_limit:
+            raise LoxRuntimeError(token, f"Out of fuel after {self.fuel_limit} steps.")
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise LoxRuntimeError(token, "Deadline exceeded.")
+        self.grant_fuel()
 
     def visit_literal_expr(self, expr: Literal) -> Any:
         return expr.value
@@ -94,9 +161,12 @@ class Interpreter(ExprVisitor, StmtVisitor):
                 self.check_number_operands(expr.operator, left, right)
                 return left - right
             case TokenType.PLUS:
-                if (isinstance(left, float) and isinstance(right, float)) or (isinstance(left, str) and isinstance(right, str)):
+                if isinstance(left, float) and isinstance(right, float):
                     return left + right
 
+                if isinstance(left, STRING_TYPES) and isinstance(right, STRING_TYPES):
+                    return concat(left, right)
+
                 raise LoxRuntimeError(expr.operator, "Operands must be two numbers or two strings.")
             case TokenType.SLASH:
                 self.check_number_operands(expr.operator, left, right)
@@ -122,13 +192,14 @@ class Interpreter(ExprVisitor, StmtVisitor):
 
         raise LoxRuntimeError(operator, "Operands must be numbers.")
 
-    def interpret(self, statements: list[Stmt]) -> None:
-        from lox import Lox
+    def interpret(self, statements: list[Stmt], source: str = None, opt_level: int = 0) -> None:
         try:
             for statement in statements:
                 self.execute(statement)
         except LoxRuntimeError as e:
-            Lox.runtime_error(e)
+            for hook in self.hooks:
+                hook.runtime_error(self, e)
+            self.diagnostics.runtime_error(e)
 
     def stringify(self, value: Any) -> str:
         if value is None:
@@ -137,66 +208,154 @@ class Interpreter(ExprVisitor, StmtVisitor):
         if isinstance(value, float) and value.is_integer():
             return str(int(value))
 
+        if isinstance(value, LoxArray):
+            return "[" + ", ".join(map(self.stringify, value)) + "]"
+
         return str(value)
 
-    def execute(self, stmt: Stmt) -> None:
-        stmt.accept(self)
+    def execute(self, stmt: Stmt) -> Any:
+        return stmt.accept(self)
+
+    def add_hook(self, hook) -> None:
+        # The hooked variants shadow the plain methods on this instance only,
+        # so an interpreter without hooks never looks at self.hooks.
+        self.hooks.append(hook)
+        self.execute = self.hooked_execute
+        self.evaluate = self.hooked_evaluate
+        self.visit_call_expr = self.hooked_call
+        self.tail_call = self.hooked_call
+
+    def remove_hook(self, hook) -> None:
+        self.hooks.remove(hook)
+        if not self.hooks:
+            for name in ("execute", "evaluate", "visit_call_expr", "tail_call"):
+                del self.__dict__[name]
+
+    def hooked_execute(self, stmt: Stmt) -> Any:
+        for hook in self.hooks:
+            hook.before_statement(self, stmt)
+        completion = stmt.accept(self)
+        for hook in self.hooks:
+            hook.after_statement(self, stmt)
+        return completion
+
+    def hooked_evaluate(self, expr: Expr) -> Any:
+        for hook in self.hooks:
+            hook.before_expression(self, expr)
+        value = expr.accept(self)
+        for hook in self.hooks:
+            hook.after_expression(self, expr, value)
+        return value
+
+    def hooked_call(self, expr: Call) -> Any:
+        # Also stands in for tail_call, so every call is reported with a
+        # matching exit and tail calls are not eliminated while hooked.
+        callee = self.evaluate(expr.callee)
+        arguments = [self.evaluate(argument) for argument in expr.arguments]
+
+        if not isinstance(callee, LoxCallable):
+            raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
+
+        if len(arguments) != callee.arity():
+            raise LoxRuntimeError(expr.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}")
+
+        self.fuel -= 1
+        if self.fuel <= 0:
+            self.refuel(expr.paren)
+
+        for hook in self.hooks:
+            hook.enter_function(self, callee, arguments)
+        try:
+            value = callee.call_(self, arguments)
+        except NativeError as e:
+            raise LoxRuntimeError(expr.paren, str(e))
+        for hook in self.hooks:
+            hook.exit_function(self, callee, value)
+        return value
+
+    def resolve(self, expr: Expr, depth: int, slot: int) -> None:
+        self.locals[expr] = (depth, slot)
 
-    def resolve(self, expr: Expr, depth: int) -> None:
-        self.locals[expr] = depth
+    def resolve_tail_call(self, expr: Call) -> None:
+        self.tail_calls.add(expr)
+
+    def resolve_pure(self, function: Function) -> None:
+        self.pure_functions.add(function)
 
     def visit_expression_stmt(self, stmt: Expression) -> None:
         self.evaluate(stmt.expression)
 
     def visit_print_stmt(self, stmt: Print) -> None:
         value = self.evaluate(stmt.expression)
-        print(self.stringify(value))
+        print(self.stringify(value), file=self.out)
 
     def visit_var_stmt(self, stmt: Var) -> Any:
+        environment = self.environment
+        if environment is not self.globals:
+            # The slot exists before the initializer runs, which may assign it.
+            values = environment.values
+            slot = len(values)
+            values.append(None)
+            if stmt.initializer is not None:
+                values[slot] = self.evaluate(stmt.initializer)
+            return
+
         value = None
 
         if stmt.initializer is not None:
             value = self.evaluate(stmt.initializer)
 
-        self.environment.define(stmt.name.lexeme, value)
+        environment.define(stmt.name.lexeme, value)
 
     def visit_variable_expr(self, expr: Variable) -> Any:
         return self.look_up_variable(expr.name, expr)
 
     def look_up_variable(self, name: Token, expr: Expr) -> Any:
-        distance = self.locals.get(expr)
-        if distance is not None:
-            return self.environment.get_at(distance, name.lexeme)
+        resolved = self.locals.get(expr)
+        if resolved is not None:
+            return self.environment.get_at(*resolved)
 
-        return self.globals.get(name)
+        # Per-site inline cache of the global's cell. A long-running session
+        # keeps meeting new sites, so the cache starts over once it is full.
+        cell = self.global_caches.get(expr)
+        if cell is not None:
+            return cell.value
+
+        if len(self.global_caches) >= GLOBAL_CACHE_SIZE:
+            self.global_caches.clear()
+        cell = self.global_caches[expr] = self.globals.cell(name)
+        return cell.value
 
     def visit_assign_expr(self, expr: Assign) -> Any:
         value = self.evaluate(expr.value)
 
-        distance = self.locals.get(expr)
-        if distance is not None:
-            self.environment.assign_at(distance, expr.name, value)
+        resolved = self.locals.get(expr)
+        if resolved is not None:
+            self.environment.assign_at(*resolved, value)
         else:
             self.globals.assign(expr.name, value)
         return value
 
-    def visit_block_stmt(self, stmt: Block):
-        self.execute_block(stmt.statements, Environment(self.environment))
+    def visit_block_stmt(self, stmt: Block) -> Any:
+        return self.execute_block(stmt.statements, Environment(self.environment))
 
-    def execute_block(self, statements: list[Stmt], environment: Environment) -> None:
+    def execute_block(self, statements: list[Stmt], environment: Environment) -> Any:
         previous = self.environment
         try:
             self.environment = environment
             for statement in statements:
-                self.execute(statement)
+                if self.execute(statement) is not None:
+                    return RETURNED
         finally:
             self.environment = previous
+        return None
 
-    def visit_if_stmt(self, stmt: If) -> None:
+    def visit_if_stmt(self, stmt: If) -> Any:
         if self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.then_branch)
+            return self.execute(stmt.then_branch)
         elif stmt.else_branch is not None:
-            self.execute(stmt.else_branch)
+            return self.execute(stmt.else_branch)
+        return None
 
     def visit_logical_expr(self, expr: Logical) -> Any:
         left = self.evaluate(expr.left)
@@ -212,9 +371,14 @@ class Interpreter(ExprVisitor, StmtVisitor):
         return self.evaluate(expr.right)
 
 
-    def visit_while_stmt(self, stmt: While) -> None:
+    def visit_while_stmt(self, stmt: While) -> Any:
         while self.is_truthy(self.evaluate(stmt.condition)):
-            self.execute(stmt.body)
+            self.fuel -= 1
+            if self.fuel <= 0:
+                self.refuel(stmt.keyword)
+            if self.execute(stmt.body) is not None:
+                return RETURNED
+        return None
 
     def visit_call_expr(self, expr):
         callee = self.evaluate(expr.callee)
@@ -226,17 +390,53 @@ class Interpreter(ExprVisitor, StmtVisitor):
         if len(arguments) != callee.arity():
             raise LoxRuntimeError(expr.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}")
 
-        return callee.call_(self, arguments)
+        self.fuel -= 1
+        if self.fuel <= 0:
+            self.refuel(expr.paren)
+
+        try:
+            return callee.call_(self, arguments)
+        except NativeError as e:
+            raise LoxRuntimeError(expr.paren, str(e))
 
 
     def visit_function_stmt(self, stmt):
-        function = LoxFunction(stmt, self.environment)
+        if stmt in self.pure_functions and self.memo_size > 0:
+            function = MemoizedFunction(stmt, self.environment, self.memo_size)
+        else:
+            function = LoxFunction(stmt, self.environment)
         self.environment.define(stmt.name.lexeme, function)
 
     def visit_return_stmt(self, stmt):
         value = None
 
-        if stmt.value is not None:
+        if stmt.value in self.tail_calls:
+            value = self.tail_call(stmt.value)
+        elif stmt.value is not None:
             value = self.evaluate(stmt.value)
 
-        raise Return(value)
\ No newline at end of file
+        self.return_value = value
+        return RETURNED
+
+    def tail_call(self, expr: Call) -> Any:
+        callee = self.evaluate(expr.callee)
+        arguments = [self.evaluate(argument) for argument in expr.arguments]
+
+        if not isinstance(callee, LoxCallable):
+            raise LoxRuntimeError(expr.paren, "Can only call functions and classes.")
+
+        if len(arguments) != callee.arity():
+            raise LoxRuntimeError(expr.paren, f"Expected {callee.arity()} arguments but got {len(arguments)}")
+
+        self.fuel -= 1
+        if self.fuel <= 0:
+            self.refuel(expr.paren)
+
+        if type(callee) is LoxFunction:
+            return TailCall(callee, arguments)
+        if type(callee) is MemoizedFunction:
+            return callee.tail_call(self, arguments)
+        try:
+            return callee.call_(self, arguments)
+        except NativeError as e:
+            raise LoxRuntimeError(expr.paren, str(e))
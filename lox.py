@@ -1,80 +1,181 @@
+import sys
+import time
+from itertools import islice
+from closure_compiler import ClosureInterpreter
+from diagnostics import Diagnostics
+from fast_scanner import FastScanner, StreamingScanner
 from interpreter import Interpreter
+from optimizer import Optimizer, count_nodes
 from parser import Parser
+from program_cache import ProgramCache, Resolution
 from resolver import Resolver
-from runtime_error import LoxRuntimeError
-from scanner import Scanner
-from stmt import Stmt
-from token_type import TokenType
-from token_ import Token
-
-
-class Lox:
-    interpreter = None
-    had_error = False
-    had_runtime_error = False
-
-    @staticmethod
-    def get_interpreter():
-        if Lox.interpreter is None:
-            Lox.interpreter = Interpreter()
-        return Lox.interpreter
-
-    @staticmethod
-    def run_file(path: str):
+from token_window import TokenWindow
+from transpiler import TranspilingInterpreter
+from vm import VM
+
+
+# Sources at least this large are scanned into a compact TokenBuffer.
+TOKEN_BUFFER_THRESHOLD = 1 << 20
+# 0 runs the resolved tree as parsed, 1 folds constants first and 2 also
+# removes dead code.
+OPT_LEVEL = 1
+
+BACKENDS = {
+    "interpreter": Interpreter,
+    "closure": ClosureInterpreter,
+    "python": TranspilingInterpreter,
+    "vm": VM,
+}
+
+
+# One Lox program's world: an interpreter for the chosen backend, the
+# diagnostics every stage reports to and the sink print writes to. Sessions
+# share no state, so separate ones can run side by side on different threads.
+class LoxSession(Diagnostics):
+    def __init__(self, backend: str = "interpreter", out=None):
+        super().__init__(out)
+        self.backend = backend
+        self.interpreter = BACKENDS[backend](self)
+        self.report_optimizations = False
+        # When set to a dict, run and compile add the seconds spent in each phase.
+        self.phase_times = None
+
+    def run_file(self, path: str, stream: bool = False, cache: bool = True, opt_level: int = OPT_LEVEL) -> int:
         with open(path) as f:
-            Lox.run(f.read())
-
-        if Lox.had_error:
-            exit(65)
-
-        if Lox.had_runtime_error:
-            exit(70)
-
-    @staticmethod
-    def run_prompt():
+            if stream:
+                self.run_stream(f, opt_level)
+            else:
+                self.run(f.read(), ProgramCache.for_script(path) if cache else None, opt_level)
+        return self.exit_status()
+
+    def exit_status(self) -> int:
+        if self.had_error:
+            return 65
+
+        if self.had_runtime_error:
+            return 70
+        return 0
+
+    def run_prompt(self, opt_level: int = OPT_LEVEL):
+        # Later lines can rebind the globals an earlier line's pure functions
+        # call, so nothing is memoized in the REPL.
+        interpreter = self.interpreter
+        interpreter.memo_size = 0
         while True:
             try:
                 line = input("> ")
             except EOFError:
                 break
-            Lox.run(line)
-            Lox.had_error = False
-
-    @staticmethod
-    def run(source: str):
-        scanner = Scanner(source)
-        tokens = scanner.scan_tokens()
+            # Each line gets the whole budget, so waiting for input is free.
+            interpreter.set_budget(interpreter.fuel_limit, interpreter.time_limit)
+            self.run(line, opt_level=opt_level)
+            self.had_error = False
+
+    def run(self, source: str, cache: ProgramCache = None, opt_level: int = OPT_LEVEL):
+        interpreter = self.interpreter
+
+        start = time.perf_counter()
+        program = None if cache is None else cache.load(source, opt_level)
+        if cache is not None:
+            start = self.record_phase("load", start)
+        if program is None:
+            program = self.compile(source, opt_level)
+            if program is None:
+                return
+
+            if cache is not None:
+                start = time.perf_counter()
+                cache.store(source, opt_level, *program)
+                self.record_phase("store", start)
+
+        statements, resolution = program
+        interpreter.locals.update(resolution.locals)
+        interpreter.tail_calls.update(resolution.tail_calls)
+        interpreter.pure_functions.update(resolution.pure_functions)
+        start = time.perf_counter()
+        interpreter.interpret(statements, source, opt_level)
+        self.record_phase("execute", start)
+
+    def compile(self, source: str, opt_level: int = OPT_LEVEL):
+        start = time.perf_counter()
+        scanner = FastScanner(source, self)
+        if len(source) >= TOKEN_BUFFER_THRESHOLD:
+            tokens = scanner.scan_token_buffer()
+        else:
+            tokens = scanner.scan_tokens()
+        start = self.record_phase("scan", start)
 
-        parser = Parser(tokens)
+        parser = Parser(tokens, self)
         statements = parser.parse()
-        if Lox.had_error:
-            return
+        start = self.record_phase("parse", start)
+        if self.had_error:
+            return None
 
-        resolver = Resolver(Lox.get_interpreter())
+        resolution = Resolution()
+        resolver = Resolver(resolution)
         resolver.resolve_statements(statements)
-
-        if Lox.had_error:
-            return
-
-        Lox.get_interpreter().interpret(statements)
-
-    @staticmethod
-    def error(line: int, message: str):
-        Lox.report(line, "", message)
-
-    @staticmethod
-    def report(line: int, where: str, message: str):
-        print(f"[line {line!s}] Error {where}: {message}")
-        Lox.had_error = True
-
-    @staticmethod
-    def parse_error(token: Token, message: str):
-        if token.type == TokenType.EOF:
-            Lox.report(token.line, " at end", message)
-        else:
-            Lox.report(token.line, f" at '{token.lexeme}'", message)
-
-    @staticmethod
-    def runtime_error(error: LoxRuntimeError):
-        print(f"{error}\n[line {error.token.line}]")
-        Lox.had_runtime_error = True
+        start = self.record_phase("resolve", start)
+
+        if self.had_error:
+            return None
+
+        if opt_level > 0:
+            optimizer = Optimizer(opt_level, resolution.locals)
+            optimized = optimizer.optimize(statements)
+            if self.report_optimizations:
+                print(optimizer.report(count_nodes(statements), count_nodes(optimized)), file=sys.stderr)
+            start = self.record_phase("optimize", start)
+
+            statements = optimized
+            resolution = Resolution()
+            resolver = Resolver(resolution)
+            resolver.resolve_statements(statements)
+
+        resolver.infer_purity()
+        self.record_phase("resolve", start)
+        return statements, resolution
+
+    def record_phase(self, phase: str, start: float) -> float:
+        now = time.perf_counter()
+        if self.phase_times is not None:
+            self.phase_times[phase] = self.phase_times.get(phase, 0.0) + now - start
+        return now
+
+    # Scans, parses, resolves and executes one top-level declaration at a time,
+    # so memory does not grow with the script and output starts immediately.
+    # Unlike run, declarations before a syntax error have already executed.
+    def run_stream(self, file, opt_level: int = OPT_LEVEL):
+        interpreter = self.interpreter
+        resolver = Resolver(interpreter)
+        parser = Parser(TokenWindow(StreamingScanner(file, diagnostics=self).scan_stream()), self)
+
+        for statement in parser.parse_stream():
+            if self.had_error:
+                continue
+
+            if opt_level > 0:
+                resolution = Resolution()
+                Resolver(resolution).resolve_statement(statement)
+                if self.had_error:
+                    continue
+                statement = Optimizer(opt_level, resolution.locals).optimize_statement(statement)
+                if statement is None:
+                    continue
+
+            functions = len(resolver.dependencies)
+            resolved = len(interpreter.locals)
+            resolver.resolve_statement(statement)
+            if self.had_error:
+                continue
+
+            interpreter.interpret([statement])
+            if self.had_runtime_error:
+                return
+
+            # Only a function body can run again once its statement has, so
+            # unless the statement declared one its resolution can go, and
+            # memory stays flat however long the stream is.
+            if len(resolver.dependencies) == functions:
+                locals_ = interpreter.locals
+                for expr in list(islice(reversed(locals_), len(locals_) - resolved)):
+                    del locals_[expr]
@@ -0,0 +1,172 @@
+import operator
+from array import array
+from itertools import repeat
+from native import NativeModule
+from runtime_error import NativeError
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+# A fixed-length vector of Lox numbers, stored contiguously in a NumPy array
+# when NumPy is installed and in an array("d") otherwise. The bulk functions
+# below work on the whole vector at once, in C, instead of one element per
+# interpreted Lox operation.
+class LoxArray:
+    __slots__ = ("data",)
+
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __iter__(self):
+        return map(float, self.data)
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LoxArray) and len(self.data) == len(other.data) and all(map(operator.eq, self.data, other.data))
+
+    # Arrays are mutable, so they are unhashable like lists; a memoized
+    # function called with one just runs uncached.
+    __hash__ = None
+
+
+def zeros(size: int):
+    if numpy is not None:
+        return numpy.zeros(size)
+    return array("d", [0.0]) * size
+
+
+def check_array(value) -> LoxArray:
+    if not isinstance(value, LoxArray):
+        raise NativeError("Operand must be an array.")
+    return value
+
+
+def check_size(value) -> int:
+    if type(value) is not float or not value.is_integer() or value < 0:
+        raise NativeError("Size must be a non-negative integer.")
+    return int(value)
+
+
+def check_index(array_: LoxArray, value, end: bool = False) -> int:
+    # An end index may point one past the last element.
+    if type(value) is not float or not value.is_integer() or not 0 <= value < len(array_.data) + end:
+        raise NativeError("Index out of range.")
+    return int(value)
+
+
+def check_number(value) -> float:
+    if type(value) is not float:
+        raise NativeError("Operand must be a number.")
+    return value
+
+
+def elementwise(op, left, right, name: str) -> LoxArray:
+    data = check_array(left).data
+    if isinstance(right, LoxArray):
+        if len(right.data) != len(data):
+            raise NativeError(f"Arrays passed to {name} must have the same length.")
+        other = right.data
+    else:
+        other = check_number(right)
+
+    if op is operator.truediv and (0.0 in other if isinstance(right, LoxArray) else other == 0.0):
+        raise NativeError("Division by zero.")
+
+    if numpy is not None:
+        return LoxArray(op(data, other))
+    if isinstance(right, LoxArray):
+        return LoxArray(array("d", map(op, data, other)))
+    return LoxArray(array("d", map(op, data, repeat(other))))
+
+
+ARRAY = NativeModule("array")
+
+
+@ARRAY.function("array", 1)
+def new_array(size):
+    return LoxArray(zeros(check_size(size)))
+
+
+@ARRAY.function("arrayRange", 1)
+def array_range(size):
+    size = check_size(size)
+    if numpy is not None:
+        return LoxArray(numpy.arange(size, dtype=float))
+    return LoxArray(array("d", map(float, range(size))))
+
+
+@ARRAY.function("arrayLen", 1)
+def array_len(array_):
+    return float(len(check_array(array_).data))
+
+
+@ARRAY.function("arrayGet", 2)
+def array_get(array_, index):
+    index = check_index(check_array(array_), index)
+    return float(array_.data[index])
+
+
+@ARRAY.function("arraySet", 3)
+def array_set(array_, index, value):
+    index = check_index(check_array(array_), index)
+    array_.data[index] = check_number(value)
+    return value
+
+
+@ARRAY.function("arrayFill", 2)
+def array_fill(array_, value):
+    data = check_array(array_).data
+    value = check_number(value)
+    if numpy is not None:
+        data.fill(value)
+    else:
+        data[:] = array("d", [value]) * len(data)
+    return array_
+
+
+@ARRAY.function("arraySlice", 3)
+def array_slice(array_, start, end):
+    start = check_index(check_array(array_), start, True)
+    end = check_index(array_, end, True)
+    if end < start:
+        raise NativeError("Slice end must not be before its start.")
+    return LoxArray(array_.data[start:end].copy() if numpy is not None else array_.data[start:end])
+
+
+@ARRAY.function("arrayAdd", 2)
+def array_add(left, right):
+    return elementwise(operator.add, left, right, "arrayAdd")
+
+
+@ARRAY.function("arraySub", 2)
+def array_sub(left, right):
+    return elementwise(operator.sub, left, right, "arraySub")
+
+
+@ARRAY.function("arrayMul", 2)
+def array_mul(left, right):
+    return elementwise(operator.mul, left, right, "arrayMul")
+
+
+@ARRAY.function("arrayDiv", 2)
+def array_div(left, right):
+    return elementwise(operator.truediv, left, right, "arrayDiv")
+
+
+@ARRAY.function("arraySum", 1)
+def array_sum(array_):
+    data = check_array(array_).data
+    return float(data.sum()) if numpy is not None else sum(data, 0.0)
+
+
+@ARRAY.function("arrayDot", 2)
+def array_dot(left, right):
+    left, right = check_array(left).data, check_array(right).data
+    if len(left) != len(right):
+        raise NativeError("Arrays passed to arrayDot must have the same length.")
+    return float(numpy.dot(left, right)) if numpy is not None else sum(map(operator.mul, left, right), 0.0)
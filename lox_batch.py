@@ -0,0 +1,86 @@
+import argparse
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lox import BACKENDS, OPT_LEVEL, LoxSession
+
+
+def find_scripts(patterns: list[str]) -> list[str]:
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "**", "*.lox")
+        paths.extend(sorted(glob.glob(pattern, recursive=True)))
+    return list(dict.fromkeys(paths))
+
+
+# Runs in a pool worker, which imports the interpreter once and then serves
+# many scripts, each in a fresh session.
+def run_script(path: str, backend: str, cache: bool, opt_level: int, fuel: int, deadline: float) -> dict:
+    out = io.StringIO()
+    start = time.perf_counter()
+    try:
+        session = LoxSession(backend, out)
+        session.interpreter.set_budget(fuel, deadline)
+        exit_code = session.run_file(path, cache=cache, opt_level=opt_level)
+    except Exception as e:
+        out.write(f"{type(e).__name__}: {e}\n")
+        exit_code = 1
+    return {"path": path, "exit_code": exit_code, "seconds": time.perf_counter() - start, "stdout": out.getvalue()}
+
+
+def run_batch(
+    paths: list[str], jobs: int, backend: str, cache: bool, opt_level: int, fuel: int = None, deadline: float = None
+) -> list[dict]:
+    # Small chunks keep the workers evenly loaded when script run times vary.
+    chunksize = max(1, len(paths) // (jobs * 8))
+    with ProcessPoolExecutor(jobs) as pool:
+        count = len(paths)
+        return list(pool.map(
+            run_script, paths, [backend] * count, [cache] * count, [opt_level] * count, [fuel] * count,
+            [deadline] * count, chunksize=chunksize
+        ))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="lox_batch.py", description="Run many Lox scripts on a process pool.")
+    parser.add_argument("scripts", nargs="+", help="script files, directories or glob patterns")
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="interpreter")
+    parser.add_argument("-O", "--opt-level", type=int, choices=[0, 1, 2], default=OPT_LEVEL)
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the compiled-program cache")
+    parser.add_argument("--fuel", type=int, metavar="N", help="stop each script after N loop iterations and calls")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS", help="stop each script once running this long")
+    parser.add_argument("--json", metavar="OUT", help="write every script's stdout, exit code and time here")
+    parser.add_argument("--show-output", action="store_true", help="print each script's stdout after its summary line")
+    args = parser.parse_args()
+
+    paths = find_scripts(args.scripts)
+    if not paths:
+        parser.error("no .lox scripts found")
+
+    start = time.perf_counter()
+    results = run_batch(paths, args.jobs, args.backend, not args.no_cache, args.opt_level, args.fuel, args.deadline)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        print(f"{result['exit_code']:4}  {result['seconds'] * 1e3:9.1f} ms  {result['path']}")
+        if args.show_output:
+            sys.stdout.write(result["stdout"])
+
+    failed = sum(1 for result in results if result["exit_code"] != 0)
+    busy = sum(result["seconds"] for result in results)
+    print(
+        f"{len(results)} scripts, {failed} failed, {elapsed:.2f} s wall, {busy:.2f} s in scripts, "
+        f"{len(results) / elapsed:.1f} scripts/s on {args.jobs} workers"
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"jobs": args.jobs, "seconds": elapsed, "results": results}, f, indent=2)
+
+    sys.exit(1 if failed else 0)
@@ -1,6 +1,14 @@
+from collections import OrderedDict
 from environment import Environment
 from lox_callable import LoxCallable
-from return_exception import Return
+
+
+class TailCall:
+    __slots__ = ("function", "arguments")
+
+    def __init__(self, function: "LoxFunction", arguments: list):
+        self.function = function
+        self.arguments = arguments
 
 
 class LoxFunction(LoxCallable):
@@ -15,10 +23,63 @@ class LoxFunction(LoxCallable):
         return len(self.declaration.params)
 
     def call_(self, interpreter, arguments):
-        environment = Environment(self.closure)
-        for parm, arg in zip(self.declaration.params, arguments):
-            environment.define(parm.lexeme, arg)
+        # A return in tail position hands back a TailCall instead of calling,
+        # and this loop runs it without growing the Python stack.
+        function = self
+        while True:
+            environment = Environment(function.closure, list(arguments))
+            if interpreter.execute_block(function.declaration.body, environment) is None:
+                return None
+
+            value = interpreter.return_value
+            interpreter.return_value = None
+            if type(value) is not TailCall:
+                return value
+            function = value.function
+            arguments = value.arguments
+
+
+# A LoxFunction the Resolver proved pure, so its results can be cached by
+# argument. Types are part of the key because true == 1 in Python.
+class MemoizedFunction(LoxFunction):
+    def __init__(self, declaration, closure, size: int):
+        super().__init__(declaration, closure)
+        self.memo = OrderedDict()
+        self.size = size
+
+    def call_(self, interpreter, arguments):
+        key = (tuple(arguments), tuple(map(type, arguments)))
+        memo = self.memo
+        try:
+            hit = key in memo
+        except TypeError:
+            # Unhashable arguments are mutable, so the result cannot be cached.
+            return super().call_(interpreter, arguments)
+        if hit:
+            memo.move_to_end(key)
+            interpreter.memo_hits += 1
+            return memo[key]
+
+        interpreter.memo_misses += 1
+        value = super().call_(interpreter, arguments)
+        memo[key] = value
+        if len(memo) > self.size:
+            memo.popitem(last=False)
+        return value
+
+    def tail_call(self, interpreter, arguments):
+        # A miss runs through the caller's trampoline, which cannot store the
+        # result, so only the outermost call of a tail-recursive chain is cached.
+        key = (tuple(arguments), tuple(map(type, arguments)))
+        memo = self.memo
         try:
-            interpreter.execute_block(self.declaration.body, environment)
-        except Return as r:
-            return r.value
+            hit = key in memo
+        except TypeError:
+            return TailCall(self, arguments)
+        if hit:
+            memo.move_to_end(key)
+            interpreter.memo_hits += 1
+            return memo[key]
+
+        interpreter.memo_misses += 1
+        return TailCall(self, arguments)
@@ -1,14 +1,63 @@
+import argparse
 import sys
-from lox import Lox
+from hooks import HOT_TOP, CounterHook
+from interpreter import MEMO_SIZE
+from lox import BACKENDS, OPT_LEVEL, LoxSession
+from profiler import PROFILE_INTERVAL, PROFILE_TOP, Profiler
+from program_cache import ProgramCache
 
 
 if __name__ == "__main__":
-    if len(sys.argv) > 2:
-        print("Usage: lox.py [script]")
-        exit(64)
+    parser = argparse.ArgumentParser(prog="lox.py")
+    parser.add_argument("script", nargs="?")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="interpreter")
+    parser.add_argument("-O", "--opt-level", type=int, choices=[0, 1, 2], default=OPT_LEVEL)
+    parser.add_argument("--opt-stats", action="store_true", help="print what the optimizer removed to stderr")
+    parser.add_argument("--memo-size", type=int, default=MEMO_SIZE, help="results cached per pure function, 0 to disable")
+    parser.add_argument("--fuel", type=int, metavar="N", help="stop with a runtime error after N loop iterations and calls")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS", help="stop with a runtime error once running this long")
+    parser.add_argument("--memo-stats", action="store_true", help="print memoization hits and misses to stderr")
+    parser.add_argument("--no-cache", action="store_true", help="do not read or write the compiled-program cache")
+    parser.add_argument("--clear-cache", action="store_true", help="delete the script's cached programs first")
+    parser.add_argument("--stream", action="store_true", help="execute the script while it is being read")
+    parser.add_argument("--profile", metavar="OUT", help="sample the Lox call stack and write collapsed stacks to OUT")
+    parser.add_argument("--profile-interval", type=float, default=PROFILE_INTERVAL * 1e3, metavar="MS", help="sampling interval in milliseconds")
+    parser.add_argument("--profile-top", type=int, default=PROFILE_TOP, metavar="N", help="rows in the profile table printed to stderr")
+    parser.add_argument("--counters", action="store_true", help="count and time every node and print the hottest loops and calls to stderr")
+    args = parser.parse_args()
+    if args.profile is not None and args.backend != "interpreter":
+        parser.error("--profile requires the interpreter backend")
+    if args.counters and args.backend != "interpreter":
+        parser.error("--counters requires the interpreter backend")
 
-    if len(sys.argv) == 2:
-        script = sys.argv[1]
-        Lox.run_file(script)
+    session = LoxSession(args.backend)
+    session.report_optimizations = args.opt_stats
+    session.interpreter.memo_size = args.memo_size
+    session.interpreter.set_budget(args.fuel, args.deadline)
+    if args.script is not None:
+        if args.clear_cache:
+            ProgramCache.for_script(args.script).clear()
+        counters = None
+        if args.counters:
+            counters = CounterHook()
+            session.interpreter.add_hook(counters)
+        profiler = None
+        if args.profile is not None:
+            profiler = Profiler(args.profile_interval / 1e3)
+            profiler.start()
+        try:
+            status = session.run_file(args.script, args.stream, not (args.no_cache or args.opt_stats), args.opt_level)
+        finally:
+            if profiler is not None:
+                profiler.stop()
+                with open(args.profile, "w") as f:
+                    profiler.write_collapsed(f)
+                print(profiler.report(args.profile_top), file=sys.stderr)
+            if counters is not None:
+                print(counters.report(HOT_TOP), file=sys.stderr)
+        if args.memo_stats:
+            interpreter = session.interpreter
+            print(f"memo: {interpreter.memo_hits} hits, {interpreter.memo_misses} misses", file=sys.stderr)
+        sys.exit(status)
     else:
-        Lox.run_prompt()
\ No newline at end of file
+        session.run_prompt(args.opt_level)
\ No newline at end of file
@@ -0,0 +1,252 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import time
+from multiprocessing import Pipe, Process
+from lox import BACKENDS, OPT_LEVEL, LoxSession
+
+
+HOST = "127.0.0.1"
+PORT = 7878
+TIMEOUT = 5.0
+# How long past its timeout a worker gets to stop the script itself before it
+# is killed, which is only needed when the script is stuck in a native call.
+KILL_GRACE = 1.0
+# Most characters of output sent in one message, which bounds how long the
+# server's event loop spends reading any one of them.
+OUTPUT_CHUNK = 64 * 1024
+# Longest request line, source included, that the server reads.
+REQUEST_LIMIT = 16 * 1024 * 1024
+
+
+# The output sink of a worker's session: complete lines are sent back to the
+# server as soon as they are printed, while the rest of a line waits for its
+# newline. A line longer than a chunk goes out in pieces.
+class PipeWriter:
+    def __init__(self, connection):
+        self.connection = connection
+        self.pending = []
+        self.size = 0
+
+    def write(self, text: str) -> int:
+        self.pending.append(text)
+        self.size += len(text)
+        if "\n" in text or self.size >= OUTPUT_CHUNK:
+            pending = "".join(self.pending)
+            end = pending.rfind("\n") + 1
+            if len(pending) - end >= OUTPUT_CHUNK:
+                end = len(pending)
+            self.send(pending[:end])
+            self.pending = [pending[end:]]
+            self.size = len(pending) - end
+        return len(text)
+
+    def flush(self) -> None:
+        self.send("".join(self.pending))
+        self.pending.clear()
+        self.size = 0
+
+    def send(self, text: str) -> None:
+        for start in range(0, len(text), OUTPUT_CHUNK):
+            self.connection.send({"output": text[start:start + OUTPUT_CHUNK]})
+
+
+# Body of a worker process: it has already imported the interpreter and runs
+# one request after another, each in a fresh session.
+def serve_requests(connection) -> None:
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            return
+
+        out = PipeWriter(connection)
+        session = LoxSession(request["backend"], out)
+        session.interpreter.set_budget(request["fuel"], request["timeout"])
+        if request["memo_size"] is not None:
+            session.interpreter.memo_size = request["memo_size"]
+        start = time.perf_counter()
+        try:
+            session.run(request["source"], opt_level=request["opt_level"])
+            status = session.exit_status()
+        except Exception as e:
+            out.write(f"{type(e).__name__}: {e}\n")
+            status = 1
+        out.flush()
+        connection.send({"status": status, "seconds": time.perf_counter() - start})
+
+
+# Like StreamReader.readline, but a line over the reader's limit is read to
+# its end and dropped before raising ValueError, so that the next request
+# starts where the client's does.
+async def read_request_line(reader: asyncio.StreamReader) -> bytes:
+    try:
+        return await reader.readuntil(b"\n")
+    except asyncio.IncompleteReadError as e:
+        return e.partial
+    except asyncio.LimitOverrunError:
+        pass
+    while True:
+        try:
+            await reader.readuntil(b"\n")
+            break
+        except asyncio.IncompleteReadError:
+            break
+        except asyncio.LimitOverrunError as e:
+            await reader.readexactly(e.consumed)
+    raise ValueError(f"request longer than {REQUEST_LIMIT} bytes")
+
+
+class Worker:
+    def __init__(self):
+        self.connection, child = Pipe()
+        self.process = Process(target=serve_requests, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+
+    async def run(self, request: dict, emit) -> dict:
+        self.connection.send(request)
+        while True:
+            message = await self.receive()
+            if "output" not in message:
+                return message
+            await emit(message)
+
+    async def receive(self) -> dict:
+        loop = asyncio.get_running_loop()
+        readable = loop.create_future()
+        fd = self.connection.fileno()
+        loop.add_reader(fd, lambda: readable.done() or readable.set_result(None))
+        try:
+            await readable
+        finally:
+            loop.remove_reader(fd)
+        return self.connection.recv()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+# Worker processes started up front and handed out one request at a time. A
+# script that overruns its request's timeout normally stops itself with a
+# runtime error. A worker that does not reply even then, or whose client goes
+# away mid-run, is killed and replaced, since its session cannot be interrupted.
+class WorkerPool:
+    def __init__(self, size: int):
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(Worker())
+
+    async def run(self, request: dict, emit) -> dict:
+        timeout = request["timeout"]
+        worker = await self.idle.get()
+        try:
+            return await asyncio.wait_for(worker.run(request, emit), timeout + KILL_GRACE)
+        except asyncio.TimeoutError:
+            worker.kill()
+            worker = Worker()
+            return {"error": f"timed out after {timeout:g} s"}
+        except BaseException:
+            worker.kill()
+            worker = Worker()
+            raise
+        finally:
+            self.idle.put_nowait(worker)
+
+    def close(self) -> None:
+        while not self.idle.empty():
+            self.idle.get_nowait().kill()
+
+
+# Speaks newline-delimited JSON. Each request is an object with "source" and
+# optionally "backend", "opt_level", "timeout", "fuel" and "memo_size"; the
+# reply is any number of {"output": text} messages followed by
+# {"status": code, "seconds": time} or {"error": message}. A connection may
+# send several requests in turn, each on a line of at most REQUEST_LIMIT bytes.
+class LoxServer:
+    def __init__(self, workers: int, backend: str = "interpreter", timeout: float = TIMEOUT):
+        self.pool = WorkerPool(workers)
+        self.backend = backend
+        self.timeout = timeout
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        async def emit(message: dict) -> None:
+            writer.write(json.dumps(message).encode() + b"\n")
+            await writer.drain()
+
+        try:
+            while True:
+                try:
+                    line = await read_request_line(reader)
+                    if not line:
+                        break
+                    request = self.parse_request(line)
+                except (ValueError, KeyError, TypeError) as e:
+                    await emit({"error": f"bad request: {e}"})
+                    continue
+                await emit(await self.pool.run(request, emit))
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def parse_request(self, line: bytes) -> dict:
+        request = json.loads(line)
+        if not isinstance(request, dict):
+            raise ValueError("expected a JSON object")
+        backend = request.get("backend", self.backend)
+        if backend not in BACKENDS:
+            raise ValueError(f"unknown backend {backend!r}")
+        opt_level = request.get("opt_level", OPT_LEVEL)
+        if opt_level not in (0, 1, 2):
+            raise ValueError(f"unknown optimization level {opt_level!r}")
+        timeout = float(request.get("timeout", self.timeout))
+        # A timeout that expires at once would only kill and restart a worker.
+        if not (math.isfinite(timeout) and timeout > 0):
+            raise ValueError(f"bad timeout {request['timeout']!r}")
+        fuel = request.get("fuel")
+        if fuel is not None and (type(fuel) is not int or fuel < 0):
+            raise ValueError(f"bad fuel {fuel!r}")
+        memo_size = request.get("memo_size")
+        if memo_size is not None and (type(memo_size) is not int or memo_size < 0):
+            raise ValueError(f"bad memo_size {memo_size!r}")
+        return {
+            "source": str(request["source"]),
+            "backend": backend,
+            "opt_level": opt_level,
+            "timeout": min(timeout, self.timeout),
+            "fuel": fuel,
+            "memo_size": memo_size,
+        }
+
+    async def serve(self, host: str = HOST, port: int = PORT, path: str = None) -> None:
+        if path is not None:
+            server = await asyncio.start_unix_server(self.handle, path, limit=REQUEST_LIMIT)
+        else:
+            server = await asyncio.start_server(self.handle, host, port, limit=REQUEST_LIMIT)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="lox_server.py", description="Serve Lox script runs from warm worker processes.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--unix", metavar="PATH", help="listen on a Unix socket instead of TCP")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="worker processes")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="interpreter", help="default for requests that name none")
+    parser.add_argument("--timeout", type=float, default=TIMEOUT, help="seconds per request, also the most a request may ask for")
+    args = parser.parse_args()
+
+    server = LoxServer(args.workers, args.backend, args.timeout)
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
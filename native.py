@@ -0,0 +1,37 @@
+from typing import Callable
+from environment import GlobalEnvironment
+from lox_callable import LoxCallable
+from rope import flatten
+
+
+class NativeFunction(LoxCallable):
+    def __init__(self, name: str, arity: int, function: Callable):
+        self.name = name
+        self.n = arity
+        self.function = function
+
+    def arity(self) -> int:
+        return self.n
+
+    def call_(self, interpreter, arguments):
+        return self.function(*map(flatten, arguments))
+
+    def __str__(self):
+        return "<native fn>"
+
+
+# A named set of native functions that an interpreter defines as globals.
+class NativeModule:
+    def __init__(self, name: str):
+        self.name = name
+        self.functions = {}
+
+    def function(self, name: str, arity: int) -> Callable:
+        def register(function: Callable) -> Callable:
+            self.functions[name] = NativeFunction(name, arity, function)
+            return function
+        return register
+
+    def install(self, globals_: GlobalEnvironment) -> None:
+        for name, function in self.functions.items():
+            globals_.define(name, function)
@@ -0,0 +1,313 @@
+from typing import Any
+from expr import Assign, Binary, Call, Expr, Grouping, Literal, Logical, Unary, Variable
+from expr import Visitor as ExprVisitor
+from stmt import Block, Expression, Function, If, Print, Return, Stmt, Var, While
+from stmt import Visitor as StmtVisitor
+from token_type import TokenType
+
+
+NUMBER_RESULTS = {TokenType.MINUS, TokenType.SLASH, TokenType.STAR}
+BOOLEAN_RESULTS = {
+    TokenType.BANG_EQUAL, TokenType.EQUAL_EQUAL, TokenType.GREATER, TokenType.GREATER_EQUAL,
+    TokenType.LESS, TokenType.LESS_EQUAL,
+}
+
+
+class Unfoldable(Exception):
+    pass
+
+
+def walk(nodes):
+    stack = list(nodes)
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (Expr, Stmt)):
+            yield node
+            stack.extend(getattr(node, field) for field in node.__dataclass_fields__)
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def count_nodes(statements: list[Stmt]) -> int:
+    return sum(1 for _ in walk(statements))
+
+
+# Rewrites the AST into an equivalent one with constant subexpressions folded
+# into Literals. Only operations that cannot fail are folded: anything the
+# interpreter would reject at runtime ("a" - 1, 1 / 0) is left for it to
+# report with the usual message and line. Unchanged subtrees are returned
+# as-is; rewritten ones are new nodes, so the result has to be resolved again
+# before it is executed.
+#
+# Level 2 also removes dead code: If and While statements with a constant
+# condition are pruned, statements after a Return are dropped, and so are
+# local Vars that are never referenced and whose initializer cannot fail or
+# have side effects. Pruned statements come back as None. `locals_` is the
+# resolution of the input tree and tells local variable reads from global
+# ones, which can fail.
+class Optimizer(ExprVisitor, StmtVisitor):
+    def __init__(self, opt_level: int = 1, locals_: dict = None):
+        self.opt_level = opt_level
+        self.locals = {} if locals_ is None else locals_
+        self.stats = {
+            "folded constants": 0,
+            "pruned branches": 0,
+            "pruned loops": 0,
+            "unreachable statements": 0,
+            "unused locals": 0,
+        }
+
+    def optimize(self, statements: list[Stmt], local: bool = False) -> list[Stmt]:
+        optimized = []
+        for index, statement in enumerate(statements):
+            statement = self.optimize_statement(statement)
+            if statement is None:
+                continue
+
+            optimized.append(statement)
+            if self.opt_level >= 2 and isinstance(statement, Return):
+                self.stats["unreachable statements"] += len(statements) - index - 1
+                break
+
+        if self.opt_level >= 2 and local:
+            optimized = self.remove_unused_locals(optimized)
+        return optimized
+
+    def remove_unused_locals(self, statements: list[Stmt]) -> list[Stmt]:
+        # Any reference by name keeps a Var, even one that is shadowed.
+        referenced = {node.name.lexeme for node in walk(statements) if isinstance(node, (Assign, Variable))}
+        kept = []
+        for statement in statements:
+            if (
+                isinstance(statement, Var)
+                and statement.name.lexeme not in referenced
+                and (statement.initializer is None or self.is_pure(statement.initializer))
+            ):
+                self.stats["unused locals"] += 1
+                continue
+            kept.append(statement)
+        return kept
+
+    def optimize_statement(self, stmt: Stmt) -> Stmt | None:
+        return stmt.accept(self)
+
+    def optimize_branch(self, stmt: Stmt) -> Stmt:
+        optimized = self.optimize_statement(stmt)
+        return Block([]) if optimized is None else optimized
+
+    def report(self, before: int, after: int) -> str:
+        lines = [f"optimizer: {before} -> {after} nodes ({before - after} removed)"]
+        lines.extend(f"  {name:<24}{count:8}" for name, count in self.stats.items())
+        return "\n".join(lines)
+
+    def optimize_expression(self, expr: Expr) -> Expr:
+        return expr.accept(self)
+
+    def visit_block_stmt(self, stmt: Block) -> Stmt:
+        return Block(self.optimize(stmt.statements, True))
+
+    def visit_expression_stmt(self, stmt: Expression) -> Stmt:
+        expression = self.optimize_expression(stmt.expression)
+        return stmt if expression is stmt.expression else Expression(expression)
+
+    def visit_function_stmt(self, stmt: Function) -> Stmt:
+        return Function(stmt.name, stmt.params, self.optimize(stmt.body, True))
+
+    def visit_if_stmt(self, stmt: If) -> Stmt | None:
+        condition = self.optimize_expression(stmt.condition)
+        if self.opt_level >= 2 and isinstance(condition, Literal):
+            self.stats["pruned branches"] += 1
+            branch = stmt.then_branch if self.is_truthy(condition.value) else stmt.else_branch
+            return None if branch is None else self.optimize_statement(branch)
+
+        then_branch = self.optimize_branch(stmt.then_branch)
+        else_branch = None if stmt.else_branch is None else self.optimize_branch(stmt.else_branch)
+        return If(condition, then_branch, else_branch)
+
+    def visit_print_stmt(self, stmt: Print) -> Stmt:
+        expression = self.optimize_expression(stmt.expression)
+        return stmt if expression is stmt.expression else Print(expression)
+
+    def visit_return_stmt(self, stmt: Return) -> Stmt:
+        if stmt.value is None:
+            return stmt
+
+        value = self.optimize_expression(stmt.value)
+        return stmt if value is stmt.value else Return(stmt.keyword, value)
+
+    def visit_var_stmt(self, stmt: Var) -> Stmt:
+        if stmt.initializer is None:
+            return stmt
+
+        initializer = self.optimize_expression(stmt.initializer)
+        return stmt if initializer is stmt.initializer else Var(stmt.name, initializer)
+
+    def visit_while_stmt(self, stmt: While) -> Stmt | None:
+        condition = self.optimize_expression(stmt.condition)
+        if self.opt_level >= 2 and isinstance(condition, Literal) and not self.is_truthy(condition.value):
+            self.stats["pruned loops"] += 1
+            return None
+
+        return While(stmt.keyword, condition, self.optimize_branch(stmt.body))
+
+    def visit_assign_expr(self, expr: Assign) -> Expr:
+        value = self.optimize_expression(expr.value)
+        return expr if value is expr.value else Assign(expr.name, value)
+
+    def visit_binary_expr(self, expr: Binary) -> Expr:
+        left = self.optimize_expression(expr.left)
+        right = self.optimize_expression(expr.right)
+        operator = expr.operator.type
+
+        if isinstance(left, Literal) and isinstance(right, Literal):
+            try:
+                folded = Literal(self.fold_binary(operator, left.value, right.value))
+            except Unfoldable:
+                pass
+            else:
+                self.stats["folded constants"] += 1
+                return folded
+
+        # x * 1, 1 * x, x / 1 and x - 0 are exact for every float, but only
+        # when x is known to be a number; otherwise they must still fail.
+        if self.is_number(left) and self.is_literal(right, 1.0) and operator in (TokenType.STAR, TokenType.SLASH):
+            return left
+        if self.is_number(right) and self.is_literal(left, 1.0) and operator == TokenType.STAR:
+            return right
+        if self.is_number(left) and self.is_literal(right, 0.0) and operator == TokenType.MINUS:
+            return left
+
+        if left is expr.left and right is expr.right:
+            return expr
+        return Binary(left, expr.operator, right)
+
+    def fold_binary(self, operator: TokenType, left: Any, right: Any) -> Any:
+        match operator:
+            case TokenType.EQUAL_EQUAL:
+                return self.is_equal(left, right)
+            case TokenType.BANG_EQUAL:
+                return not self.is_equal(left, right)
+            case TokenType.PLUS:
+                if (type(left) is float and type(right) is float) or (type(left) is str and type(right) is str):
+                    return left + right
+                raise Unfoldable()
+
+        if type(left) is not float or type(right) is not float:
+            raise Unfoldable()
+
+        match operator:
+            case TokenType.GREATER:
+                return left > right
+            case TokenType.GREATER_EQUAL:
+                return left >= right
+            case TokenType.LESS:
+                return left < right
+            case TokenType.LESS_EQUAL:
+                return left <= right
+            case TokenType.MINUS:
+                return left - right
+            case TokenType.STAR:
+                return left * right
+            case TokenType.SLASH:
+                if right == 0:
+                    raise Unfoldable()
+                return left / right
+        raise Unfoldable()
+
+    def visit_call_expr(self, expr: Call) -> Expr:
+        callee = self.optimize_expression(expr.callee)
+        arguments = [self.optimize_expression(argument) for argument in expr.arguments]
+        if callee is expr.callee and all(new is old for new, old in zip(arguments, expr.arguments)):
+            return expr
+        return Call(callee, expr.paren, arguments)
+
+    def visit_grouping_expr(self, expr: Grouping) -> Expr:
+        return self.optimize_expression(expr.expression)
+
+    def visit_literal_expr(self, expr: Literal) -> Expr:
+        return expr
+
+    def visit_logical_expr(self, expr: Logical) -> Expr:
+        left = self.optimize_expression(expr.left)
+        right = self.optimize_expression(expr.right)
+
+        if isinstance(left, Literal):
+            self.stats["folded constants"] += 1
+            truthy = self.is_truthy(left.value)
+            if expr.operator.type == TokenType.OR:
+                return left if truthy else right
+            return right if truthy else left
+
+        if left is expr.left and right is expr.right:
+            return expr
+        return Logical(left, expr.operator, right)
+
+    def visit_unary_expr(self, expr: Unary) -> Expr:
+        right = self.optimize_expression(expr.right)
+
+        if expr.operator.type == TokenType.BANG:
+            if isinstance(right, Literal):
+                self.stats["folded constants"] += 1
+                return Literal(not self.is_truthy(right.value))
+            if isinstance(right, Unary) and right.operator.type == TokenType.BANG and self.is_boolean(right.right):
+                return right.right
+        elif expr.operator.type == TokenType.MINUS:
+            if isinstance(right, Literal) and type(right.value) is float:
+                self.stats["folded constants"] += 1
+                return Literal(-right.value)
+            if isinstance(right, Unary) and right.operator.type == TokenType.MINUS and self.is_number(right.right):
+                return right.right
+
+        return expr if right is expr.right else Unary(expr.operator, right)
+
+    def visit_variable_expr(self, expr: Variable) -> Expr:
+        return expr
+
+    def is_truthy(self, value: Any) -> bool:
+        return value is not None and value is not False
+
+    def is_equal(self, left: Any, right: Any) -> bool:
+        if left is None:
+            return right is None
+        return left == right
+
+    def is_literal(self, expr: Expr, value: float) -> bool:
+        # Compared by repr so that -0.0 does not count as 0.0.
+        return isinstance(expr, Literal) and type(expr.value) is float and repr(expr.value) == repr(value)
+
+    def is_number(self, expr: Expr) -> bool:
+        match expr:
+            case Literal(value):
+                return type(value) is float
+            case Unary(operator, _):
+                return operator.type == TokenType.MINUS
+            case Binary(left, operator, right):
+                if operator.type == TokenType.PLUS:
+                    return self.is_number(left) and self.is_number(right)
+                return operator.type in NUMBER_RESULTS
+        return False
+
+    def is_pure(self, expr: Expr) -> bool:
+        # Expressions that can neither fail nor have side effects.
+        match expr:
+            case Literal():
+                return True
+            case Variable():
+                return expr in self.locals
+            case Logical(left, _, right):
+                return self.is_pure(left) and self.is_pure(right)
+            case Unary(operator, right):
+                return operator.type == TokenType.BANG and self.is_pure(right)
+            case Binary(left, operator, right):
+                return operator.type in (TokenType.EQUAL_EQUAL, TokenType.BANG_EQUAL) and self.is_pure(left) and self.is_pure(right)
+        return False
+
+    def is_boolean(self, expr: Expr) -> bool:
+        match expr:
+            case Literal(value):
+                return type(value) is bool
+            case Unary(operator, _):
+                return operator.type == TokenType.BANG
+            case Binary(_, operator, _):
+                return operator.type in BOOLEAN_RESULTS
+        return False
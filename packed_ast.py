@@ -0,0 +1,120 @@
+from array import array
+from typing import Any
+from expr import Assign, Binary, Call, Grouping, Literal, Logical, Unary, Variable
+from stmt import Block, Expression, Function, If, Print, Return, Var, While, Stmt
+from token_ import Token
+
+
+# Node class and field encodings, indexed by kind.
+LAYOUT = [
+    (Assign, ('token', 'node')),
+    (Binary, ('node', 'token', 'node')),
+    (Call, ('node', 'token', 'nodes')),
+    (Grouping, ('node',)),
+    (Literal, ('value',)),
+    (Logical, ('node', 'token', 'node')),
+    (Unary, ('token', 'node')),
+    (Variable, ('token',)),
+    (Block, ('nodes',)),
+    (Expression, ('node',)),
+    (Function, ('token', 'tokens', 'nodes')),
+    (If, ('node', 'node', 'node')),
+    (Print, ('node',)),
+    (Return, ('token', 'node')),
+    (Var, ('token', 'node')),
+    (While, ('token', 'node', 'node')),
+]
+KINDS = {cls: kind for kind, (cls, _) in enumerate(LAYOUT)}
+
+
+# Struct-of-arrays AST: one entry per node in `kinds` and `offsets`, with the
+# node's fields stored contiguously in `fields` as child node indices, token
+# indices or value indices. Lists are stored as a count followed by items.
+class PackedAst:
+    def __init__(self, tokens: list[Token] = None):
+        self.kinds = array("B")
+        self.offsets = array("i")
+        self.fields = array("i")
+        self.roots = array("i")
+        self.tokens = [] if tokens is None else tokens
+        self.values = []
+        self.token_index = {id(token): i for i, token in enumerate(self.tokens)}
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    def statement(self, index: int) -> Stmt:
+        return self.unpack(self.roots[index])
+
+    def statements(self) -> list[Stmt]:
+        return [self.unpack(root) for root in self.roots]
+
+    def pack(self, node: Any) -> int:
+        if node is None:
+            return -1
+
+        cls = type(node)
+        values = []
+        for encoding, field in zip(LAYOUT[KINDS[cls]][1], cls.__dataclass_fields__):
+            value = getattr(node, field)
+            match encoding:
+                case "node":
+                    values.append(self.pack(value))
+                case "nodes":
+                    values.append(len(value))
+                    values.extend(self.pack(item) for item in value)
+                case "token":
+                    values.append(self.add_token(value))
+                case "tokens":
+                    values.append(len(value))
+                    values.extend(self.add_token(item) for item in value)
+                case "value":
+                    values.append(len(self.values))
+                    self.values.append(value)
+
+        self.kinds.append(KINDS[cls])
+        self.offsets.append(len(self.fields))
+        self.fields.extend(values)
+        return len(self.kinds) - 1
+
+    def add_token(self, token: Token) -> int:
+        index = self.token_index.get(id(token))
+        if index is None:
+            index = len(self.tokens)
+            self.tokens.append(token)
+            self.token_index[id(token)] = index
+        return index
+
+    def unpack(self, index: int) -> Any:
+        if index < 0:
+            return None
+
+        cls, encodings = LAYOUT[self.kinds[index]]
+        fields = self.fields
+        position = self.offsets[index]
+        args = []
+        for encoding in encodings:
+            value = fields[position]
+            position += 1
+            match encoding:
+                case "node":
+                    args.append(self.unpack(value))
+                case "nodes":
+                    args.append([self.unpack(item) for item in fields[position:position + value]])
+                    position += value
+                case "token":
+                    args.append(self.tokens[value])
+                case "tokens":
+                    args.append([self.tokens[item] for item in fields[position:position + value]])
+                    position += value
+                case "value":
+                    args.append(self.values[value])
+        return cls(*args)
+
+
+def pack(statements: list[Stmt], tokens: list[Token] = None) -> PackedAst:
+    packed = PackedAst(tokens)
+    for statement in statements:
+        packed.roots.append(packed.pack(statement))
+    packed.token_index = {}
+    return packed
@@ -1,3 +1,4 @@
+from diagnostics import Diagnostics
 from expr import Assign, Binary, Call, Expr, Grouping, Literal, Logical, Unary, Variable
 from stmt import Block, Expression, Function, If, Print, Return, Stmt, Var, While
 from token_type import TokenType
@@ -9,8 +10,9 @@ class ParseError(RuntimeError):
 
 
 class Parser:
-    def __init__(self, tokens):
+    def __init__(self, tokens, diagnostics: Diagnostics = None):
         self.tokens = tokens
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
         self.current = 0
 
     def expression(self) -> Expr:
@@ -178,8 +180,7 @@ class Parser:
         raise self.error(self.peek(), message)
 
     def error(self, token: Token, message: str) -> ParseError:
-        from lox import Lox
-        Lox.parse_error(token, message)
+        self.diagnostics.parse_error(token, message)
         return ParseError()
 
     def parse(self) -> list[Stmt]:
@@ -189,6 +190,10 @@ class Parser:
 
         return statements
 
+    def parse_stream(self):
+        while not self.is_at_end():
+            yield self.declaration()
+
     def statement(self) -> Stmt:
         if self.match(TokenType.FOR):
             return self.for_statement()
@@ -222,6 +227,7 @@ class Parser:
 
 
     def for_statement(self) -> While:
+        keyword = self.previous()
         self.consume(TokenType.LEFT_PAREN, "Expected '(' after 'for'.")
 
         initializer = None
@@ -252,7 +258,7 @@ class Parser:
         if condition is None:
             condition = Literal(True)
 
-        body = While(condition, body)
+        body = While(keyword, condition, body)
 
         if initializer is not None:
             body = Block([initializer, body])
@@ -261,12 +267,13 @@ class Parser:
 
 
     def while_(self) -> While:
+        keyword = self.previous()
         self.consume(TokenType.LEFT_PAREN, "Expected '(' after 'while'.")
         condition = self.expression()
         self.consume(TokenType.RIGHT_PAREN, "Expected ')' after while condition.")
 
         body = self.statement()
-        return While(condition, body)
+        return While(keyword, condition, body)
 
     def if_statement(self) -> If:
         self.consume(TokenType.LEFT_PAREN, "Expected '(' after 'if'.")
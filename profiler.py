@@ -0,0 +1,153 @@
+import sys
+import threading
+import time
+from collections import Counter
+from interpreter import Interpreter
+from lox_function import LoxFunction
+from token_ import Token
+
+
+PROFILE_INTERVAL = 0.001
+PROFILE_TOP = 10
+# The sampler can only take a sample once the interpreting thread lets go of
+# the GIL, which it is only asked to do every sys.getswitchinterval() seconds
+# (5 ms by default). While profiling, the switch interval is this fraction of
+# the sampling interval.
+SWITCH_FRACTION = 0.25
+
+CALL_CODE = LoxFunction.call_.__code__
+EXECUTE_CODE = Interpreter.execute.__code__
+
+
+def statement_line(node) -> int | None:
+    # The first token found in the node's fields, searching depth-first.
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Token):
+            return node.line
+        if isinstance(node, list):
+            stack.extend(reversed(node))
+        elif hasattr(node, "__dataclass_fields__"):
+            stack.extend(getattr(node, field) for field in reversed(node.__dataclass_fields__))
+    return None
+
+
+def frame_label(frame: tuple[str, int | None]) -> str:
+    name, line = frame
+    return name if line is None else f"{name}:{line}"
+
+
+# Samples the Lox call stack of the tree-walking interpreter from a background
+# thread. Each sample walks the interpreting thread's Python frames: every
+# LoxFunction.call_ frame is one Lox frame, labelled with the line of the
+# innermost statement executing in it. Nothing is traced, so the program runs
+# at full speed between samples. Samples still come further apart than asked
+# when the GIL is slow to change hands, so the report gives the interval it
+# actually measured and times derived from it.
+class Profiler:
+    def __init__(self, interval: float = PROFILE_INTERVAL):
+        self.interval = interval
+        self.samples = Counter()
+        self.lines = {}
+        self.thread_id = None
+        self.running = False
+        self.thread = None
+        self.switch_interval = None
+        self.started = None
+        self.elapsed = 0.0
+
+    def start(self) -> None:
+        self.thread_id = threading.get_ident()
+        self.switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(min(self.switch_interval, self.interval * SWITCH_FRACTION))
+        self.running = True
+        self.started = time.perf_counter()
+        self.thread = threading.Thread(target=self.sample_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running = False
+        self.thread.join()
+        self.elapsed = time.perf_counter() - self.started
+        sys.setswitchinterval(self.switch_interval)
+
+    def measured_interval(self) -> float:
+        total = sum(self.samples.values())
+        return self.elapsed / total if total else self.interval
+
+    def sample_loop(self) -> None:
+        # Sleeping until the next tick rather than for a whole interval keeps
+        # the time spent taking a sample out of the gap between samples. A
+        # sampler that has fallen behind starts counting again from now
+        # instead of catching up in a burst.
+        tick = time.perf_counter()
+        while self.running:
+            now = time.perf_counter()
+            tick = max(tick + self.interval, now)
+            time.sleep(tick - now)
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.samples[self.stack(frame)] += 1
+
+    def stack(self, frame) -> tuple[tuple[str, int], ...]:
+        frames = []
+        line = None
+        while frame is not None:
+            code = frame.f_code
+            if code is EXECUTE_CODE:
+                if line is None:
+                    line = self.line(frame.f_locals["stmt"])
+            elif code is CALL_CODE:
+                # Before the trampoline binds `function`, self is the callee.
+                f_locals = frame.f_locals
+                function = f_locals.get("function", f_locals["self"])
+                frames.append((function.declaration.name.lexeme, line))
+                line = None
+            frame = frame.f_back
+        frames.append(("<script>", line))
+        frames.reverse()
+        return tuple(frames)
+
+    def line(self, stmt) -> int | None:
+        line = self.lines.get(stmt)
+        if line is None:
+            line = self.lines[stmt] = statement_line(stmt)
+        return line
+
+    def write_collapsed(self, file) -> None:
+        for stack, count in self.samples.most_common():
+            file.write(";".join(map(frame_label, stack)) + f" {count}\n")
+
+    def report(self, top: int = PROFILE_TOP) -> str:
+        total = sum(self.samples.values())
+        functions_self, functions_total = Counter(), Counter()
+        lines_self, lines_total = Counter(), Counter()
+        for stack, count in self.samples.items():
+            name, line = stack[-1]
+            functions_self[name] += count
+            lines_self[frame_label(stack[-1])] += count
+            for name in {name for name, _ in stack}:
+                functions_total[name] += count
+            for label in set(map(frame_label, stack)):
+                lines_total[label] += count
+
+        # Each sample stands for the measured interval, whatever was asked.
+        interval = self.measured_interval()
+        out = [
+            f"{total} samples in {self.elapsed:.2f} s, every {interval * 1e3:.2f} ms"
+            f" ({self.interval * 1e3:g} ms requested)"
+        ]
+        for title, self_counts, total_counts in (
+            ("function", functions_self, functions_total),
+            ("line", lines_self, lines_total),
+        ):
+            out.append(f"  {title:<24}{'self':>10}{'total':>10}{'self ms':>10}{'total ms':>10}")
+            for label, count in total_counts.most_common(top):
+                self_share = 100 * self_counts[label] / total
+                total_share = 100 * count / total
+                out.append(
+                    f"  {label:<24}{self_share:9.1f}%{total_share:9.1f}%"
+                    f"{self_counts[label] * interval * 1e3:10.1f}{count * interval * 1e3:10.1f}"
+                )
+        return "\n".join(out)
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from stmt import Stmt
+
+
+CACHE_VERSION = 4
+CACHE_DIR = "__loxcache__"
+CACHE_MAX_BYTES = 64 << 20
+MAGIC = b"LOXC"
+
+
+# Stands in for the interpreter while resolving, so the Resolver's results
+# for one program can be cached on their own.
+class Resolution:
+    def __init__(self):
+        self.locals = {}
+        self.tail_calls = set()
+        self.pure_functions = set()
+
+    def resolve(self, expr, depth: int, slot: int) -> None:
+        self.locals[expr] = (depth, slot)
+
+    def resolve_tail_call(self, expr) -> None:
+        self.tail_calls.add(expr)
+
+    def resolve_pure(self, function) -> None:
+        self.pure_functions.add(function)
+
+
+# Resolved programs pickled as <directory>/<key>.loxc. The key covers the
+# source text, the optimization level, CACHE_VERSION and the Python
+# implementation, so edited scripts and interpreter upgrades miss instead of
+# loading stale trees. Hits refresh the file's mtime, and the oldest files are
+# evicted once the directory grows past max_bytes. Unpickling can run arbitrary
+# code, so the cache is only used while its directory belongs to this user and
+# nobody else can write to it.
+class ProgramCache:
+    def __init__(self, directory: str, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def for_script(path: str) -> "ProgramCache":
+        directory = os.environ.get("LOX_CACHE_DIR")
+        if not directory:
+            directory = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR)
+        return ProgramCache(directory)
+
+    def key(self, source: str, opt_level: int) -> str:
+        salt = f"{CACHE_VERSION}:{sys.implementation.cache_tag}:{opt_level}:"
+        return hashlib.sha256((salt + source).encode()).hexdigest()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key + ".loxc")
+
+    def trusted(self) -> bool:
+        try:
+            info = os.stat(self.directory)
+        except OSError:
+            return False
+        if hasattr(os, "getuid"):
+            return info.st_uid == os.getuid() and not info.st_mode & 0o022
+        return True
+
+    def load(self, source: str, opt_level: int = 0) -> tuple[list[Stmt], Resolution] | None:
+        if not self.trusted():
+            return None
+
+        path = self.path(self.key(source, opt_level))
+        try:
+            with open(path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise pickle.UnpicklingError(path)
+                program = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            self.remove(path)
+            return None
+
+        # A hit in a cache we can read but not touch still counts; it just
+        # won't look recent to evict().
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return program
+
+    def store(self, source: str, opt_level: int, statements: list[Stmt], resolution: Resolution) -> None:
+        try:
+            data = pickle.dumps((statements, resolution), pickle.HIGHEST_PROTOCOL)
+        except RecursionError:
+            return
+
+        try:
+            os.makedirs(self.directory, mode=0o700, exist_ok=True)
+            if not self.trusted():
+                return
+            fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError:
+            return
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(MAGIC)
+                f.write(data)
+            os.replace(temp, self.path(self.key(source, opt_level)))
+        except OSError:
+            self.remove(temp)
+            return
+
+        self.evict()
+
+    def entries(self) -> list[os.DirEntry]:
+        try:
+            with os.scandir(self.directory) as it:
+                return [entry for entry in it if entry.name.endswith(".loxc")]
+        except FileNotFoundError:
+            return []
+
+    def evict(self) -> None:
+        files = []
+        for entry in self.entries():
+            # Another process may have evicted it since the scan.
+            try:
+                info = entry.stat()
+            except OSError:
+                continue
+            files.append((info.st_mtime, info.st_size, entry.path))
+
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_bytes:
+                break
+            total -= size
+            self.remove(path)
+
+    def clear(self) -> None:
+        for entry in self.entries():
+            self.remove(entry.path)
+
+    def remove(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
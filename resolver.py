@@ -1,4 +1,5 @@
 from enum import Enum
+from expr import Call, Variable
 from expr import Visitor as ExprVisitor
 from runtime_error import LoxRuntimeError
 from stmt import Visitor as StmtVisitor
@@ -13,7 +14,18 @@ class Resolver(ExprVisitor, StmtVisitor):
     def __init__(self, interpreter):
         self.interpreter = interpreter
         self.scopes = []
+        self.slots = []
         self.current_function = FunctionType.NONE
+        # Purity bookkeeping: the functions being resolved with the index of
+        # their outermost scope, the global names each function reads, the
+        # functions that do something impure themselves, and the top-level
+        # functions whose names are never declared again or assigned.
+        self.functions = []
+        self.dependencies = {}
+        self.impure = set()
+        self.global_functions = {}
+        self.global_names = set()
+        self.rebound = set()
 
     def visit_block_stmt(self, stmt):
         self.begin_scope()
@@ -32,9 +44,11 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     def begin_scope(self):
         self.scopes.append({})
+        self.slots.append({})
 
     def end_scope(self):
         self.scopes.pop()
+        self.slots.pop()
 
     def visit_var_stmt(self, stmt):
         self.declare(stmt.name)
@@ -46,6 +60,9 @@ class Resolver(ExprVisitor, StmtVisitor):
 
     def declare(self, name):
         if len(self.scopes) == 0:
+            if name.lexeme in self.global_names:
+                self.rebound.add(name.lexeme)
+            self.global_names.add(name.lexeme)
             return
 
         scope = self.scopes[-1]
@@ -54,6 +71,7 @@ class Resolver(ExprVisitor, StmtVisitor):
             raise LoxRuntimeError(name, "Already a variable with this name in this scope.")
 
         scope[name.lexeme] = False
+        self.slots[-1][name.lexeme] = len(self.slots[-1])
 
     def define(self, name):
         if len(self.scopes) == 0:
@@ -68,20 +86,36 @@ class Resolver(ExprVisitor, StmtVisitor):
             if scope.get(expr.name.lexeme) is False:
                 raise LoxRuntimeError(expr.name, "Can't read local variable in its own initializer.")
 
-        self.resolve_local(expr, expr.name)
+        i = self.resolve_local(expr, expr.name)
+        if self.functions:
+            if i is None:
+                self.dependencies[self.functions[-1][0]].add(expr.name.lexeme)
+            elif i < self.functions[-1][1]:
+                self.mark_impure()
 
-    def resolve_local(self, expr, name):
+    def find_scope(self, name):
         for i in range(len(self.scopes) - 1, -1, -1):
-            scope = self.scopes[i]
-            if name.lexeme in scope:
-                self.interpreter.resolve(expr, len(self.scopes) - 1 - i)
-                return
+            if name.lexeme in self.scopes[i]:
+                return i
+        return None
+
+    def resolve_local(self, expr, name):
+        i = self.find_scope(name)
+        if i is not None:
+            self.interpreter.resolve(expr, len(self.scopes) - 1 - i, self.slots[i][name.lexeme])
+        return i
 
     def visit_assign_expr(self, expr):
         self.resolve_expression(expr.value)
-        self.resolve_local(expr, expr.name)
+        i = self.resolve_local(expr, expr.name)
+        if i is None:
+            self.rebound.add(expr.name.lexeme)
+        if self.functions and (i is None or i < self.functions[-1][1]):
+            self.mark_impure()
 
     def visit_function_stmt(self, stmt):
+        if len(self.scopes) == 0:
+            self.global_functions[stmt.name.lexeme] = stmt
         self.declare(stmt.name)
         self.define(stmt.name)
         self.resolve_function(stmt, FunctionType.FUNCTION)
@@ -90,6 +124,12 @@ class Resolver(ExprVisitor, StmtVisitor):
         enclosing_function = self.current_function
         self.current_function = function_type
 
+        # A nested function is a new closure on every call, so the enclosing
+        # function cannot return a cached one.
+        self.mark_impure()
+        self.functions.append((function, len(self.scopes)))
+        self.dependencies[function] = set()
+
         self.begin_scope()
         for param in function.params:
             self.declare(param)
@@ -97,8 +137,32 @@ class Resolver(ExprVisitor, StmtVisitor):
         self.resolve_statements(function.body)
         self.end_scope()
 
+        self.functions.pop()
         self.current_function = enclosing_function
 
+    def mark_impure(self):
+        if self.functions:
+            self.impure.add(self.functions[-1][0])
+
+    # A function is pure if it does nothing impure itself and every global it
+    # reads is a pure top-level function that is never rebound. Recursion is
+    # handled by starting from every candidate and dropping the ones that
+    # depend on something outside the set until nothing changes.
+    def infer_purity(self):
+        pure = {function for function in self.dependencies if function not in self.impure}
+        changed = True
+        while changed:
+            changed = False
+            for function in list(pure):
+                for name in self.dependencies[function]:
+                    if name in self.rebound or self.global_functions.get(name) not in pure:
+                        pure.discard(function)
+                        changed = True
+                        break
+
+        for function in pure:
+            self.interpreter.resolve_pure(function)
+
     def visit_expression_stmt(self, stmt):
         self.resolve_expression(stmt.expression)
 
@@ -109,6 +173,7 @@ class Resolver(ExprVisitor, StmtVisitor):
             self.resolve_statement(stmt.else_branch)
 
     def visit_print_stmt(self, stmt):
+        self.mark_impure()
         self.resolve_expression(stmt.expression)
 
     def visit_return_stmt(self, stmt):
@@ -117,6 +182,8 @@ class Resolver(ExprVisitor, StmtVisitor):
 
         if stmt.value is not None:
             self.resolve_expression(stmt.value)
+            if isinstance(stmt.value, Call):
+                self.interpreter.resolve_tail_call(stmt.value)
 
         return None
 
@@ -129,6 +196,9 @@ class Resolver(ExprVisitor, StmtVisitor):
         self.resolve_expression(expr.right)
 
     def visit_call_expr(self, expr):
+        # Only calls to global functions can be checked for purity.
+        if not isinstance(expr.callee, Variable) or self.find_scope(expr.callee.name) is not None:
+            self.mark_impure()
         self.resolve_expression(expr.callee)
         for arg in expr.arguments:
             self.resolve_expression(arg)
@@ -0,0 +1,55 @@
+# Concatenations shorter than this just build a new str.
+ROPE_THRESHOLD = 256
+
+
+# A Lox string built by repeated concatenation, kept as a list of pieces and
+# joined only when its text is needed. Ropes extended from the same prefix
+# share the list: the rope whose count reaches the end of it appends in
+# place, so a loop doing s = s + piece costs O(1) amortized per iteration
+# instead of copying s every time. Any other rope copies its prefix first.
+class Rope:
+    __slots__ = ("parts", "count", "text")
+
+    def __init__(self, parts: list[str], count: int):
+        self.parts = parts
+        self.count = count
+        self.text = None
+
+    def __str__(self) -> str:
+        if self.text is None:
+            self.text = "".join(self.parts[:self.count])
+        return self.text
+
+    def __eq__(self, other) -> bool:
+        if type(other) is str or type(other) is Rope:
+            return str(self) == str(other)
+        return False
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __repr__(self) -> str:
+        return f"Rope({str(self)!r})"
+
+
+STRING_TYPES = (str, Rope)
+
+
+def concat(left: str | Rope, right: str | Rope) -> str | Rope:
+    if type(right) is Rope:
+        right = str(right)
+
+    if type(left) is Rope:
+        parts = left.parts
+        if len(parts) != left.count:
+            parts = parts[:left.count]
+        parts.append(right)
+        return Rope(parts, len(parts))
+
+    if len(left) + len(right) < ROPE_THRESHOLD:
+        return left + right
+    return Rope([left, right], 2)
+
+
+def flatten(value):
+    return str(value) if type(value) is Rope else value
@@ -4,4 +4,9 @@ from token_ import Token
 class LoxRuntimeError(RuntimeError):
     def __init__(self, token: Token, message: str):
         super().__init__(message)
-        self.token = token
\ No newline at end of file
+        self.token = token
+
+# Raised by native functions, which have no token of their own. The call site
+# turns it into a LoxRuntimeError at the call's closing parenthesis.
+class NativeError(RuntimeError):
+    pass
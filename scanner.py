@@ -1,3 +1,5 @@
+from diagnostics import Diagnostics
+from token_buffer import TokenBuffer
 from token_type import TokenType
 from token_ import Token
 
@@ -21,9 +23,11 @@ class Scanner:
         "while": TokenType.WHILE
     }
 
-    def __init__(self, source: str):
+    def __init__(self, source: str, diagnostics: Diagnostics = None):
         self.source = source
+        self.diagnostics = Diagnostics() if diagnostics is None else diagnostics
         self.tokens = []
+        self.buffer = None
         self.start = 0
         self.current = 0
         self.line = 1
@@ -33,14 +37,19 @@ class Scanner:
             self.start = self.current
             self.scan_token()
 
-        self.tokens.append(Token(TokenType.EOF, "", None, self.line))
+        self.start = self.current
+        self.add_token(TokenType.EOF)
         return self.tokens
 
+    def scan_token_buffer(self) -> TokenBuffer:
+        self.buffer = TokenBuffer(self.source)
+        self.scan_tokens()
+        return self.buffer
+
     def is_at_end(self) -> bool:
         return self.current >= len(self.source)
 
     def scan_token(self):
-        from lox import Lox
         c = self.advance()
         match c:
             case "(":
@@ -93,13 +102,17 @@ class Scanner:
                 elif c.isalpha():
                     self.identifier()
                 else:
-                    Lox.error(self.line, f"Unexpected character: {c}")
+                    self.diagnostics.error(self.line, f"Unexpected character: {c}")
 
     def advance(self) -> str:
         self.current += 1
         return self.source[self.current - 1]
 
     def add_token(self, type_: TokenType,  literal=None):
+        if self.buffer is not None:
+            self.buffer.add(type_, self.start, self.current, self.line)
+            return
+
         text = self.source[self.start:self.current]
         self.tokens.append(Token(type_, text, literal, self.line))
 
@@ -125,7 +138,7 @@ class Scanner:
             self.advance()
 
         if self.is_at_end():
-            Lox.error(self.line, "Unterminated string.")
+            self.diagnostics.error(self.line, "Unterminated string.")
             return
 
         self.advance()
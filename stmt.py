@@ -6,23 +6,27 @@ from token_ import Token
 
 
 class Stmt(ABC):
+    __slots__ = ()
+
     @abstractmethod
     def accept(self, visitor: "Visitor") -> Any:
         pass
 
-@dataclass(unsafe_hash=True)
+# Nodes are slotted and immutable by convention: passes build new nodes
+# instead of assigning to the fields of existing ones.
+@dataclass(eq=False, slots=True)
 class Block(Stmt):
     statements: list[Stmt]
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_block_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Expression(Stmt):
     expression: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_expression_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Function(Stmt):
     name: Token
     params: list[Token]
@@ -30,7 +34,7 @@ class Function(Stmt):
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_function_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class If(Stmt):
     condition: Expr
     then_branch: Stmt
@@ -38,28 +42,29 @@ class If(Stmt):
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_if_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Print(Stmt):
     expression: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_print_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Return(Stmt):
     keyword: Token
     value: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_return_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class Var(Stmt):
     name: Token
     initializer: Expr
     def accept(self, visitor: 'Visitor') -> Any:
         return visitor.visit_var_stmt(self)
 
-@dataclass(unsafe_hash=True)
+@dataclass(eq=False, slots=True)
 class While(Stmt):
+    keyword: Token
     condition: Expr
     body: Stmt
     def accept(self, visitor: 'Visitor') -> Any:
@@ -0,0 +1,92 @@
+from array import array
+from bisect import bisect_right
+from token_type import TokenType
+from token_ import Token
+
+
+KINDS = list(TokenType)
+KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+VIEW_CACHE_SIZE = 8
+
+
+class TokenView(Token):
+    # Only the type is read up front; lexeme, literal and line are sliced out
+    # of the buffer on first access and then kept as plain attributes.
+    def __init__(self, buffer: "TokenBuffer", index: int):
+        self.buffer = buffer
+        self.index = index
+        self.type = KINDS[buffer.kinds[index]]
+
+    def __getattr__(self, name: str):
+        match name:
+            case "lexeme":
+                value = self.buffer.lexeme(self.index)
+            case "literal":
+                value = self.buffer.literal(self.index)
+            case "line":
+                value = self.buffer.line(self.index)
+            case _:
+                raise AttributeError(name)
+
+        setattr(self, name, value)
+        return value
+
+    def __reduce__(self):
+        return Token, (self.type, self.lexeme, self.literal, self.line)
+
+
+# Struct-of-arrays token stream: one byte of kind and two int32 source
+# offsets per token, plus a run-length table mapping token indices to lines.
+class TokenBuffer:
+    def __init__(self, source: str):
+        self.source = source
+        self.kinds = array("B")
+        self.starts = array("i")
+        self.ends = array("i")
+        self.line_starts = array("i")
+        self.line_numbers = array("i")
+        self.views = {}
+
+    def add(self, type_: TokenType, start: int, end: int, line: int) -> None:
+        if not self.line_numbers or self.line_numbers[-1] != line:
+            self.line_starts.append(len(self.kinds))
+            self.line_numbers.append(line)
+
+        self.kinds.append(KIND_CODES[type_])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def __getitem__(self, index: int) -> TokenView:
+        if index < 0:
+            index += len(self.kinds)
+
+        view = self.views.get(index)
+        if view is None:
+            if len(self.views) >= VIEW_CACHE_SIZE:
+                self.views.clear()
+            view = self.views[index] = TokenView(self, index)
+        return view
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    def kind(self, index: int) -> TokenType:
+        return KINDS[self.kinds[index]]
+
+    def lexeme(self, index: int) -> str:
+        return self.source[self.starts[index]:self.ends[index]]
+
+    def literal(self, index: int):
+        match KINDS[self.kinds[index]]:
+            case TokenType.NUMBER:
+                return float(self.lexeme(index))
+            case TokenType.STRING:
+                return self.source[self.starts[index] + 1:self.ends[index] - 1]
+        return None
+
+    def line(self, index: int) -> int:
+        return self.line_numbers[bisect_right(self.line_starts, index) - 1]
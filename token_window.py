@@ -0,0 +1,22 @@
+WINDOW_TRIM = 1024
+
+
+# List-like view over a token iterator. Parser only ever indexes the current
+# and the previous token, so tokens are pulled on demand and everything older
+# is dropped once more than WINDOW_TRIM tokens have been consumed.
+class TokenWindow:
+    def __init__(self, tokens):
+        self.tokens = iter(tokens)
+        self.items = []
+        self.offset = 0
+
+    def __getitem__(self, index: int):
+        position = index - self.offset
+        if position > WINDOW_TRIM:
+            del self.items[:position - 1]
+            self.offset = index - 1
+            position = 1
+
+        while position >= len(self.items):
+            self.items.append(next(self.tokens))
+        return self.items[position]
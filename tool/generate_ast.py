@@ -1,28 +1,43 @@
 import sys
 
 class AstGenerator:
+    expr_types = [
+        "Assign   : Token name, Expr value",
+        "Binary   : Expr left, Token operator, Expr right",
+        "Call     : Expr callee, Token paren, list[Expr] arguments",
+        "Grouping : Expr expression",
+        "Literal  : Any value",
+        "Logical  : Expr left, Token operator, Expr right",
+        "Unary    : Token operator, Expr right",
+        "Variable : Token name",
+    ]
+    stmt_types = [
+        "Block      : list[Stmt] statements",
+        "Expression : Expr expression",
+        "Function   : Token name, list[Token] params, list[Stmt] body",
+        "If         : Expr condition, Stmt then_branch, Stmt else_branch",
+        "Print      : Expr expression",
+        "Return     : Token keyword, Expr value",
+        "Var        : Token name, Expr initializer",
+        "While      : Token keyword, Expr condition, Stmt body",
+    ]
+    packed_fields = {
+        "Expr": "node",
+        "Stmt": "node",
+        "list[Expr]": "nodes",
+        "list[Stmt]": "nodes",
+        "Token": "token",
+        "list[Token]": "tokens",
+        "Any": "value",
+    }
+
     @staticmethod
-    def generate(output_dir: str):
-        AstGenerator.define_ast(output_dir, "Expr", [
-            "Assign   : Token name, Expr value",
-            "Binary   : Expr left, Token operator, Expr right",
-            "Call     : Expr callee, Token paren, list[Expr] arguments",
-            "Grouping : Expr expression",
-            "Literal  : Any value",
-            "Logical  : Expr left, Token operator, Expr right",
-            "Unary    : Token operator, Expr right",
-            "Variable : Token name",
-        ])
-        AstGenerator.define_ast(output_dir, "Stmt", [
-            "Block      : list[Stmt] statements",
-            "Expression : Expr expression",
-            "Function   : Token name, list[Token] params, list[Stmt] body",
-            "If         : Expr condition, Stmt then_branch, Stmt else_branch",
-            "Print      : Expr expression",
-            "Return     : Token keyword, Expr value",
-            "Var        : Token name, Expr initializer",
-            "While      : Expr condition, Stmt body",
-        ])
+    def generate(output_dir: str, packed: bool = False):
+        AstGenerator.define_ast(output_dir, "Expr", AstGenerator.expr_types)
+        AstGenerator.define_ast(output_dir, "Stmt", AstGenerator.stmt_types)
+        if packed:
+            AstGenerator.define_packed(output_dir)
+
     @staticmethod
     def define_ast(output_dir: str, base_name: str, types: list[str]):
         path = output_dir + "/" + base_name.lower() + ".py"
@@ -34,9 +49,12 @@ class AstGenerator:
                 f.write("from expr import Expr\n")
             f.write("from token_ import Token\n\n\n")
             f.write(f"class {base_name}(ABC):\n")
+            f.write("    __slots__ = ()\n\n")
             f.write("    @abstractmethod\n")
             f.write('    def accept(self, visitor: "Visitor") -> Any:\n')
             f.write("        pass\n\n")
+            f.write("# Nodes are slotted and immutable by convention: passes build new nodes\n")
+            f.write("# instead of assigning to the fields of existing ones.\n")
             for type_ in types:
                 name, fields = [x.strip() for x in type_.split(":")]
                 AstGenerator.define_type(f, base_name, name, fields)
@@ -45,7 +63,7 @@ class AstGenerator:
 
     @staticmethod
     def define_type(f, base_name: str, name: str, fields: str):
-        f.write("@dataclass(unsafe_hash=True)\n")
+        f.write("@dataclass(eq=False, slots=True)\n")
         f.write(f"class {name}({base_name}):\n")
         for field in fields.split(", "):
             type_, filed_name = field.split(" ")
@@ -63,11 +81,128 @@ class AstGenerator:
             f.write(f"    def visit_{name.lower()}_{base_name.lower()}(self, {base_name.lower()}: {name}) -> Any:\n")
             f.write(f"        pass\n\n")
 
+    @staticmethod
+    def define_packed(output_dir: str):
+        types = AstGenerator.expr_types + AstGenerator.stmt_types
+        names = [type_.split(":")[0].strip() for type_ in types]
+        expr_names = names[:len(AstGenerator.expr_types)]
+        stmt_names = names[len(AstGenerator.expr_types):]
+
+        with open(output_dir + "/packed_ast.py", "w") as f:
+            f.write("from array import array\n")
+            f.write("from typing import Any\n")
+            f.write(f"from expr import {', '.join(expr_names)}\n")
+            f.write(f"from stmt import {', '.join(stmt_names)}, Stmt\n")
+            f.write("from token_ import Token\n\n\n")
+            f.write("# Node class and field encodings, indexed by kind.\n")
+            f.write("LAYOUT = [\n")
+            for type_ in types:
+                name, fields = [x.strip() for x in type_.split(":")]
+                encodings = [AstGenerator.packed_fields[field.split(" ")[0]] for field in fields.split(", ")]
+                f.write(f"    ({name}, {tuple(encodings)!r}),\n")
+            f.write("]\n")
+            f.write("KINDS = {cls: kind for kind, (cls, _) in enumerate(LAYOUT)}\n\n\n")
+            f.write(AstGenerator.packed_template)
+
+    packed_template = '''# Struct-of-arrays AST: one entry per node in `kinds` and `offsets`, with the
+# node's fields stored contiguously in `fields` as child node indices, token
+# indices or value indices. Lists are stored as a count followed by items.
+class PackedAst:
+    def __init__(self, tokens: list[Token] = None):
+        self.kinds = array("B")
+        self.offsets = array("i")
+        self.fields = array("i")
+        self.roots = array("i")
+        self.tokens = [] if tokens is None else tokens
+        self.values = []
+        self.token_index = {id(token): i for i, token in enumerate(self.tokens)}
+
+    def __len__(self) -> int:
+        return len(self.roots)
+
+    def statement(self, index: int) -> Stmt:
+        return self.unpack(self.roots[index])
+
+    def statements(self) -> list[Stmt]:
+        return [self.unpack(root) for root in self.roots]
+
+    def pack(self, node: Any) -> int:
+        if node is None:
+            return -1
+
+        cls = type(node)
+        values = []
+        for encoding, field in zip(LAYOUT[KINDS[cls]][1], cls.__dataclass_fields__):
+            value = getattr(node, field)
+            match encoding:
+                case "node":
+                    values.append(self.pack(value))
+                case "nodes":
+                    values.append(len(value))
+                    values.extend(self.pack(item) for item in value)
+                case "token":
+                    values.append(self.add_token(value))
+                case "tokens":
+                    values.append(len(value))
+                    values.extend(self.add_token(item) for item in value)
+                case "value":
+                    values.append(len(self.values))
+                    self.values.append(value)
+
+        self.kinds.append(KINDS[cls])
+        self.offsets.append(len(self.fields))
+        self.fields.extend(values)
+        return len(self.kinds) - 1
+
+    def add_token(self, token: Token) -> int:
+        index = self.token_index.get(id(token))
+        if index is None:
+            index = len(self.tokens)
+            self.tokens.append(token)
+            self.token_index[id(token)] = index
+        return index
+
+    def unpack(self, index: int) -> Any:
+        if index < 0:
+            return None
+
+        cls, encodings = LAYOUT[self.kinds[index]]
+        fields = self.fields
+        position = self.offsets[index]
+        args = []
+        for encoding in encodings:
+            value = fields[position]
+            position += 1
+            match encoding:
+                case "node":
+                    args.append(self.unpack(value))
+                case "nodes":
+                    args.append([self.unpack(item) for item in fields[position:position + value]])
+                    position += value
+                case "token":
+                    args.append(self.tokens[value])
+                case "tokens":
+                    args.append([self.tokens[item] for item in fields[position:position + value]])
+                    position += value
+                case "value":
+                    args.append(self.values[value])
+        return cls(*args)
+
+
+def pack(statements: list[Stmt], tokens: list[Token] = None) -> PackedAst:
+    packed = PackedAst(tokens)
+    for statement in statements:
+        packed.roots.append(packed.pack(statement))
+    packed.token_index = {}
+    return packed
+'''
+
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: generate_ast.py <output directory>")
+    args = [arg for arg in sys.argv[1:] if arg != "--packed"]
+    if len(args) != 1:
+        print("Usage: generate_ast.py [--packed] <output directory>")
         exit(64)
 
-    output_dir = sys.argv[1]
-    AstGenerator.generate(output_dir)
\ No newline at end of file
+    output_dir = args[0]
+    AstGenerator.generate(output_dir, "--packed" in sys.argv[1:])
@@ -0,0 +1,94 @@
+import argparse
+import glob
+import io
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from lox import BACKENDS, LoxSession
+
+
+# Every program must print the same thing and exit the same way on every
+# backend at every optimization level as on the tree-walking interpreter at
+# -O0. The corpus in tool/parity covers closures, recursion, runtime errors
+# and their lines, and locals assigned in their own initializers; the
+# benchmark programs come along too.
+CORPORA = [
+    os.path.join(ROOT, "tool", "parity"),
+    os.path.join(ROOT, "bench", "programs"),
+]
+OPT_LEVELS = [0, 1, 2]
+
+HUGE = "9" * 400
+
+# Programs that are easier to generate than to check in.
+GENERATED = {
+    "overflowing literal": f"print {HUGE};",
+    "negated overflowing literal": f"print -{HUGE};",
+    "nan from overflowing literals": f"print {HUGE} - {HUGE};",
+    "overflowing literal in a loop": f"""
+var i = 0;
+while (i < 3) {{ print {HUGE} * i; i = i + 1; }}
+""",
+    # Deeper than Python's compiler allows, so the python backend falls back.
+    "25 nested loops": "var n = 0;\n" + "".join(
+        f"var {name} = 0; while ({name} < 1) {{ {name} = {name} + 1;\n" for name in ("loop" + c for c in "abcdefghijklmnopqrstuvwxy")
+    ) + "n = n + 1;" + "}" * 25 + "\nprint n;",
+    "300-term sum": "var x = 1; print " + " + ".join(["x"] * 300) + ";",
+}
+
+
+def load_programs(only: list[str]) -> dict[str, str]:
+    programs = dict(GENERATED)
+    for corpus in CORPORA:
+        for path in sorted(glob.glob(os.path.join(corpus, "*.lox"))):
+            with open(path) as f:
+                programs[os.path.relpath(path, ROOT)] = f.read()
+    if only:
+        programs = {name: source for name, source in programs.items() if any(part in name for part in only)}
+    return programs
+
+
+def run(source: str, backend: str, opt_level: int) -> tuple[str, int]:
+    out = io.StringIO()
+    session = LoxSession(backend, out)
+    try:
+        session.run(source, opt_level=opt_level)
+        status = session.exit_status()
+    except Exception as e:
+        out.write(f"{type(e).__name__}: {e}\n")
+        status = 1
+    return out.getvalue(), status
+
+
+def first_difference(expected: str, actual: str) -> str:
+    for number, (want, got) in enumerate(zip(expected.splitlines(), actual.splitlines()), 1):
+        if want != got:
+            return f"line {number}: expected {want!r}, got {got!r}"
+    return f"expected {len(expected.splitlines())} lines, got {len(actual.splitlines())}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check that every backend and opt level agrees with the interpreter.")
+    parser.add_argument("--backend", action="append", choices=sorted(BACKENDS), help="repeat to check several; default all")
+    parser.add_argument("--only", action="append", default=[], metavar="NAME", help="check programs whose name contains NAME")
+    args = parser.parse_args()
+
+    backends = args.backend or sorted(BACKENDS)
+    programs = load_programs(args.only)
+    failures = 0
+    for name, source in programs.items():
+        expected_output, expected_status = run(source, "interpreter", 0)
+        for backend in backends:
+            for opt_level in OPT_LEVELS:
+                output, status = run(source, backend, opt_level)
+                if output != expected_output:
+                    failures += 1
+                    print(f"{name}: {backend} -O{opt_level}: {first_difference(expected_output, output)}")
+                elif status != expected_status:
+                    failures += 1
+                    print(f"{name}: {backend} -O{opt_level}: exit {status}, expected {expected_status}")
+    print(f"{len(programs)} programs on {len(backends)} backends at -O{'/'.join(map(str, OPT_LEVELS))}, {failures} mismatches")
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,311 @@
+from typing import Any
+from bytecode import (
+    BytecodeFunction, OP_ADD, OP_CALL, OP_CLOSE_UPVALUE, OP_CLOSURE, OP_CONSTANT, OP_DEFINE_GLOBAL, OP_DIVIDE,
+    OP_EQUAL, OP_FALSE, OP_GET_GLOBAL, OP_GET_LOCAL, OP_GET_UPVALUE, OP_GREATER, OP_GREATER_EQUAL, OP_ITERATE,
+    OP_JUMP, OP_JUMP_IF_FALSE, OP_LESS, OP_LESS_EQUAL, OP_LOOP, OP_MULTIPLY, OP_NEGATE, OP_NIL, OP_NOT,
+    OP_NOT_EQUAL, OP_POP, OP_POP_JUMP_IF_FALSE, OP_PRINT, OP_RETURN, OP_SET_GLOBAL, OP_SET_LOCAL, OP_SET_UPVALUE,
+    OP_SUBTRACT, OP_TAIL_CALL, OP_TRUE,
+)
+from compiler import Compiler
+from diagnostics import Diagnostics
+from interpreter import Interpreter
+from lox_callable import LoxCallable
+from rope import STRING_TYPES, concat
+from runtime_error import LoxRuntimeError, NativeError
+from stmt import Stmt
+
+
+MAX_FRAMES = 100000
+
+
+class Upvalue:
+    def __init__(self, stack: list, index: int):
+        self.stack = stack
+        self.index = index
+
+    def close(self) -> None:
+        # Move the value off the VM stack; reads keep using stack[index].
+        self.stack = [self.stack[self.index]]
+        self.index = 0
+
+
+class Closure(LoxCallable):
+    def __init__(self, function: BytecodeFunction, upvalues: list[Upvalue]):
+        self.function = function
+        self.upvalues = upvalues
+
+    def arity(self):
+        return self.function.arity
+
+    def call_(self, interpreter, arguments):
+        return interpreter.call_closure(self, arguments)
+
+    def __str__(self):
+        return str(self.function)
+
+
+class VM(Interpreter):
+    def __init__(self, diagnostics: Diagnostics = None) -> None:
+        super().__init__(diagnostics)
+        self.stack = []
+        self.open_upvalues = {}
+
+    def interpret(self, statements: list[Stmt], source: str = None, opt_level: int = 0) -> None:
+        function = Compiler(self.locals, self.tail_calls).compile(statements)
+        try:
+            self.call_closure(Closure(function, []), [])
+        except LoxRuntimeError as e:
+            self.stack.clear()
+            self.open_upvalues.clear()
+            self.diagnostics.runtime_error(e)
+
+    def call_closure(self, closure: Closure, arguments: list) -> Any:
+        base = len(self.stack)
+        self.stack.append(closure)
+        self.stack.extend(arguments)
+        return self.run(closure, base)
+
+    def capture_upvalue(self, index: int) -> Upvalue:
+        upvalue = self.open_upvalues.get(index)
+        if upvalue is None:
+            upvalue = Upvalue(self.stack, index)
+            self.open_upvalues[index] = upvalue
+        return upvalue
+
+    def close_upvalues(self, last: int) -> None:
+        for index in [index for index in self.open_upvalues if index >= last]:
+            self.open_upvalues.pop(index).close()
+
+    def run(self, closure: Closure, base: int) -> Any:
+        stack = self.stack
+        push = stack.append
+        pop = stack.pop
+        globals_ = self.globals.values
+        frames = []
+
+        chunk = closure.function.chunk
+        code = chunk.code
+        constants = chunk.constants
+        upvalues = closure.upvalues
+        ip = 0
+
+        # Fuel is counted in a local, and self.fuel is only current while
+        # something else might read it.
+        fuel = self.fuel
+        try:
+            while True:
+                op = code[ip]
+                ip += 1
+
+                if op == OP_GET_LOCAL:
+                    push(stack[base + code[ip]])
+                    ip += 1
+                elif op == OP_CONSTANT:
+                    push(constants[code[ip]])
+                    ip += 1
+                elif op == OP_ITERATE:
+                    value = pop()
+                    if value is None or value is False:
+                        ip += code[ip]
+                    else:
+                        fuel -= 1
+                        if fuel <= 0:
+                            self.fuel = fuel
+                            self.refuel(chunk.tokens[ip])
+                            fuel = self.fuel
+                    ip += 1
+                elif op == OP_POP_JUMP_IF_FALSE:
+                    value = pop()
+                    if value is None or value is False:
+                        ip += code[ip]
+                    ip += 1
+                elif op == OP_GET_UPVALUE:
+                    upvalue = upvalues[code[ip]]
+                    push(upvalue.stack[upvalue.index])
+                    ip += 1
+                elif op == OP_GET_GLOBAL:
+                    name = constants[code[ip]]
+                    ip += 1
+                    try:
+                        push(globals_[name])
+                    except KeyError:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], f"Undefined variable '{name}'.")
+                elif op == OP_POP:
+                    pop()
+                elif op == OP_ADD:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is float and type(right) is float:
+                        stack[-1] = left + right
+                    elif type(left) in STRING_TYPES and type(right) in STRING_TYPES:
+                        stack[-1] = concat(left, right)
+                    else:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be two numbers or two strings.")
+                elif op == OP_SUBTRACT:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left - right
+                elif op == OP_LESS:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left < right
+                elif op == OP_SET_LOCAL:
+                    stack[base + code[ip]] = stack[-1]
+                    ip += 1
+                elif op == OP_LOOP:
+                    ip -= code[ip]
+                elif op == OP_CALL or op == OP_TAIL_CALL:
+                    argc = code[ip]
+                    ip += 1
+                    fuel -= 1
+                    if fuel <= 0:
+                        self.fuel = fuel
+                        self.refuel(chunk.tokens[ip - 1])
+                        fuel = self.fuel
+                    callee = stack[-1 - argc]
+                    if type(callee) is Closure:
+                        if argc != callee.function.arity:
+                            raise LoxRuntimeError(
+                                chunk.tokens[ip - 1], f"Expected {callee.function.arity} arguments but got {argc}"
+                            )
+                        if op == OP_TAIL_CALL:
+                            # The callee and its arguments replace this frame.
+                            if self.open_upvalues:
+                                self.close_upvalues(base)
+                            stack[base:] = stack[len(stack) - argc - 1:]
+                        else:
+                            if len(frames) >= MAX_FRAMES:
+                                raise LoxRuntimeError(chunk.tokens[ip - 1], "Stack overflow.")
+                            frames.append((closure, ip, base))
+                            base = len(stack) - argc - 1
+                        closure = callee
+                        chunk = closure.function.chunk
+                        code = chunk.code
+                        constants = chunk.constants
+                        upvalues = closure.upvalues
+                        ip = 0
+                    elif isinstance(callee, LoxCallable):
+                        if argc != callee.arity():
+                            raise LoxRuntimeError(chunk.tokens[ip - 1], f"Expected {callee.arity()} arguments but got {argc}")
+                        arguments = stack[len(stack) - argc:]
+                        del stack[len(stack) - argc - 1:]
+                        # A native that calls back into Lox runs on self.fuel.
+                        self.fuel = fuel
+                        try:
+                            push(callee.call_(self, arguments))
+                        except NativeError as e:
+                            raise LoxRuntimeError(chunk.tokens[ip - 1], str(e))
+                        fuel = self.fuel
+                    else:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Can only call functions and classes.")
+                elif op == OP_RETURN:
+                    result = pop()
+                    if self.open_upvalues:
+                        self.close_upvalues(base)
+                    del stack[base:]
+                    if not frames:
+                        return result
+                    closure, ip, base = frames.pop()
+                    chunk = closure.function.chunk
+                    code = chunk.code
+                    constants = chunk.constants
+                    upvalues = closure.upvalues
+                    push(result)
+                elif op == OP_SET_UPVALUE:
+                    upvalue = upvalues[code[ip]]
+                    upvalue.stack[upvalue.index] = stack[-1]
+                    ip += 1
+                elif op == OP_SET_GLOBAL:
+                    name = constants[code[ip]]
+                    ip += 1
+                    if name not in globals_:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], f"Undefined variable '{name}'.")
+                    globals_[name] = stack[-1]
+                elif op == OP_DEFINE_GLOBAL:
+                    globals_[constants[code[ip]]] = pop()
+                    ip += 1
+                elif op == OP_JUMP:
+                    ip += code[ip] + 1
+                elif op == OP_JUMP_IF_FALSE:
+                    value = stack[-1]
+                    if value is None or value is False:
+                        ip += code[ip]
+                    ip += 1
+                elif op == OP_NIL:
+                    push(None)
+                elif op == OP_TRUE:
+                    push(True)
+                elif op == OP_FALSE:
+                    push(False)
+                elif op == OP_EQUAL:
+                    right = pop()
+                    stack[-1] = self.is_equal(stack[-1], right)
+                elif op == OP_NOT_EQUAL:
+                    right = pop()
+                    stack[-1] = not self.is_equal(stack[-1], right)
+                elif op == OP_GREATER:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left > right
+                elif op == OP_GREATER_EQUAL:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left >= right
+                elif op == OP_LESS_EQUAL:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left <= right
+                elif op == OP_MULTIPLY:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left * right
+                elif op == OP_DIVIDE:
+                    right = pop()
+                    left = stack[-1]
+                    if type(left) is not float or type(right) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operands must be numbers.")
+                    stack[-1] = left / right
+                elif op == OP_NOT:
+                    value = stack[-1]
+                    stack[-1] = value is None or value is False
+                elif op == OP_NEGATE:
+                    value = stack[-1]
+                    if type(value) is not float:
+                        raise LoxRuntimeError(chunk.tokens[ip - 1], "Operand must be a number.")
+                    stack[-1] = -value
+                elif op == OP_PRINT:
+                    print(self.stringify(pop()), file=self.out)
+                elif op == OP_CLOSURE:
+                    function = constants[code[ip]]
+                    ip += 1
+                    captured = []
+                    for _ in range(function.upvalue_count):
+                        is_local = code[ip]
+                        index = code[ip + 1]
+                        ip += 2
+                        if is_local:
+                            captured.append(self.capture_upvalue(base + index))
+                        else:
+                            captured.append(upvalues[index])
+                    push(Closure(function, captured))
+                elif op == OP_CLOSE_UPVALUE:
+                    index = len(stack) - 1
+                    upvalue = self.open_upvalues.pop(index, None)
+                    if upvalue is not None:
+                        upvalue.close()
+                    pop()
+        finally:
+            self.fuel = fuel
+